@@ -1,40 +1,105 @@
-from fastapi import APIRouter, HTTPException, Depends
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from app.services.ai_analysis_service import AIAnalysisService
-from app.services.alternative_ai_service import AlternativeAIAnalysisService
+from fastapi import APIRouter, HTTPException, Depends, Response
+from app.services.ai_analysis_service import AIAnalysisService, clean_text
+from app.services.batched_ai_service import BatchedAIService
 from app.services.firestore_service import FirestoreService
-from app.services.auth_service import AuthService
+from app.api.deps import get_ai, get_batcher, get_current_user, get_fs
 from app.models.schemas import AnalysisRequest, AnalysisResponse, AnalysisType, UserResponse
+from typing import Dict, Any, Optional
+from cachetools import TTLCache
+import asyncio
+import hashlib
 import logging
+import orjson
+import os
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
-security = HTTPBearer()
-auth_service = AuthService()
 
-# Initialize services (will be initialized when needed)
-ai_service = None
-alternative_ai_service = None
-firestore_service = None
+# Static payloads are serialized once at import
+_ANALYSIS_TYPES_JSON = orjson.dumps({
+    "analysis_types": [
+        {
+            "type": "summarize",
+            "name": "Text Summarization",
+            "description": "Generate a concise summary using Cohere AI",
+            "model": "cohere/summarize-xlarge"
+        },
+        {
+            "type": "sentiment",
+            "name": "Sentiment Analysis",
+            "description": "Analyze the emotional tone using Cohere AI",
+            "model": "cohere/command"
+        },
+        {
+            "type": "question",
+            "name": "Question Answering",
+            "description": "Answer questions about the text using Cohere AI",
+            "model": "cohere/command"
+        }
+    ]
+})
+_HEALTH_JSON = orjson.dumps({"status": "healthy", "service": "analysis"})
 
-def get_services():
-    """Get or initialize services"""
-    global ai_service, alternative_ai_service, firestore_service
-    if ai_service is None:
-        ai_service = AIAnalysisService()
-    if alternative_ai_service is None:
-        alternative_ai_service = AlternativeAIAnalysisService()
-    if firestore_service is None:
-        firestore_service = FirestoreService()
-    return ai_service, alternative_ai_service, firestore_service
+# Race Cohere and Hugging Face instead of falling back sequentially (doubles upstream calls)
+SPECULATIVE_ANALYSIS = os.getenv("SPECULATIVE_ANALYSIS", "false").lower() == "true"
+
+# Successful analyses keyed by sha256(type|prompt|cleaned_text); repeated
+# documents are answered without another upstream call
+ANALYSIS_CACHE_TTL = int(os.getenv("ANALYSIS_CACHE_TTL", "600"))
+_analysis_cache = TTLCache(maxsize=2048, ttl=ANALYSIS_CACHE_TTL)
+
+# Texts longer than this (characters) are cleaned in a worker thread
+CLEAN_TEXT_THREAD_THRESHOLD = 100_000
+
+def analysis_cache_key(text: str, analysis_type: str, prompt: Optional[str] = None) -> str:
+    """Build the cache key for an analysis of already-cleaned text"""
+    return hashlib.sha256(f"{analysis_type}|{prompt or ''}|{text}".encode()).hexdigest()
+
+async def speculative_analyze(
+    ai_service: AIAnalysisService,
+    alternative_ai_service: BatchedAIService,
+    text: str,
+    analysis_type: str,
+    prompt: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Run Cohere and Hugging Face concurrently and keep the first successful result
+    
+    The slower request is cancelled as soon as one succeeds. If both fail, the
+    result that finished last is returned so its error message is surfaced.
+    text must already be cleaned.
+    """
+    tasks = {
+        asyncio.create_task(alternative_ai_service.analyze_text(
+            text=text, analysis_type=analysis_type, prompt=prompt, already_clean=True
+        )): "Cohere",
+        asyncio.create_task(ai_service.analyze_text(
+            text=text, analysis_type=analysis_type, prompt=prompt, already_clean=True
+        )): "Hugging Face"
+    }
+    pending = set(tasks)
+    analysis_result = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                analysis_result = task.result()
+                if analysis_result.get('success'):
+                    logger.info(f"Using {tasks[task]} AI service result")
+                    return analysis_result
+        return analysis_result
+    finally:
+        for task in pending:
+            task.cancel()
 
 @router.post("/analyze", response_model=AnalysisResponse)
 async def analyze_text(
     request: AnalysisRequest,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    current_user: UserResponse = Depends(get_current_user),
+    ai_service: AIAnalysisService = Depends(get_ai),
+    alternative_ai_service: BatchedAIService = Depends(get_batcher),
+    firestore_service: FirestoreService = Depends(get_fs)
 ):
     """
     Analyze text using AI models
@@ -45,140 +110,116 @@ async def analyze_text(
     Returns:
         AnalysisResponse: Contains analysis results and status
     """
-    try:
-        # Validate input
-        if not request.text or not request.text.strip():
-            raise HTTPException(
-                status_code=400,
-                detail="Text is required for analysis"
-            )
-        
-        if not request.analysis_type:
-            raise HTTPException(
-                status_code=400,
-                detail="Analysis type is required"
-            )
-        
-        # For question analysis, prompt is required
-        if request.analysis_type == AnalysisType.QUESTION and not request.prompt:
-            raise HTTPException(
-                status_code=400,
-                detail="Prompt is required for question analysis"
-            )
-        
-        # Get current user
-        token = credentials.credentials
-        current_user = await auth_service.get_current_user(token)
-        if not current_user:
-            raise HTTPException(
-                status_code=401,
-                detail="Invalid authentication credentials"
-            )
-        
-        logger.info(f"Analyzing text with type: {request.analysis_type} for user: {current_user.email}")
-        
-        # Get services
-        ai_service, alternative_ai_service, firestore_service = get_services()
-        
-        # Clean the text before analysis
-        from app.services.ai_analysis_service import clean_text
+    # Validate input
+    if not request.text or not request.text.strip():
+        raise HTTPException(
+            status_code=400,
+            detail="Text is required for analysis"
+        )
+    
+    if not request.analysis_type:
+        raise HTTPException(
+            status_code=400,
+            detail="Analysis type is required"
+        )
+    
+    # For question analysis, prompt is required
+    if request.analysis_type == AnalysisType.QUESTION and not request.prompt:
+        raise HTTPException(
+            status_code=400,
+            detail="Prompt is required for question analysis"
+        )
+    
+    logger.info(f"Analyzing text with type: {request.analysis_type} for user: {current_user.email}")
+    
+    # Clean the text before analysis; large OCR output is cleaned off the event loop
+    if len(request.text) > CLEAN_TEXT_THREAD_THRESHOLD:
+        cleaned_text = await asyncio.to_thread(clean_text, request.text)
+    else:
         cleaned_text = clean_text(request.text)
-        
-        if not cleaned_text:
-            raise HTTPException(
-                status_code=400,
-                detail="No meaningful text found after cleaning"
-            )
-        
-        # Use Cohere service if available, otherwise fallback to Hugging Face
-        analysis_result = None
-        if alternative_ai_service.cohere_api_key:
-            logger.info("Using Cohere AI service")
-            analysis_result = await alternative_ai_service.analyze_text(
-                text=cleaned_text,
-                analysis_type=request.analysis_type.value,
-                prompt=request.prompt
-            )
-        
-        # Fallback to original service if Cohere fails or not available
-        if not analysis_result or not analysis_result.get('success'):
-            logger.info("Using Hugging Face AI service")
-            analysis_result = await ai_service.analyze_text(
-                text=cleaned_text,
-                analysis_type=request.analysis_type.value,
-                prompt=request.prompt
-            )
-        
-        if not analysis_result['success']:
-            raise HTTPException(
-                status_code=422,
-                detail=analysis_result['message']
-            )
-        
-        # Ensure confidence is properly capped at 100%
-        result = analysis_result['result']
-        if 'confidence' in result:
-            result['confidence'] = min(result['confidence'], 100.0)
-        
-        # Store analysis result in Firestore if document_id is provided
-        if request.document_id:
-            try:
-                await firestore_service.add_analysis_to_document(
-                    document_id=request.document_id,
-                    analysis_type=request.analysis_type,
-                    result=result,
-                    prompt=request.prompt
-                )
-                logger.info(f"Stored analysis result for document: {request.document_id}")
-            except Exception as e:
-                logger.error(f"Failed to store analysis result: {str(e)}")
-                # Continue without storing if Firestore fails
-        
-        return AnalysisResponse(
-            analysis_type=request.analysis_type,
-            result=result,
-            success=True,
-            message=analysis_result['message'],
-            confidence=result.get('confidence')
+    
+    if not cleaned_text:
+        raise HTTPException(
+            status_code=400,
+            detail="No meaningful text found after cleaning"
         )
-        
-    except HTTPException:
-        # Re-raise HTTP exceptions
-        raise
-    except Exception as e:
-        logger.error(f"Unexpected error in text analysis: {str(e)}")
+    
+    # Reuse a recent identical analysis; otherwise use Cohere if available,
+    # falling back to Hugging Face
+    cache_key = analysis_cache_key(cleaned_text, request.analysis_type.value, request.prompt)
+    analysis_result = _analysis_cache.get(cache_key)
+    cache_hit = analysis_result is not None
+    if cache_hit:
+        logger.info("Using cached analysis result")
+    elif SPECULATIVE_ANALYSIS and alternative_ai_service.cohere_api_key:
+        analysis_result = await speculative_analyze(
+            ai_service,
+            alternative_ai_service,
+            text=cleaned_text,
+            analysis_type=request.analysis_type.value,
+            prompt=request.prompt
+        )
+    elif alternative_ai_service.cohere_api_key:
+        logger.info("Using Cohere AI service")
+        analysis_result = await alternative_ai_service.analyze_text(
+            text=cleaned_text,
+            analysis_type=request.analysis_type.value,
+            prompt=request.prompt,
+            already_clean=True
+        )
+    
+    # Fallback to original service if Cohere fails or not available
+    if not analysis_result or not analysis_result.get('success'):
+        logger.info("Using Hugging Face AI service")
+        analysis_result = await ai_service.analyze_text(
+            text=cleaned_text,
+            analysis_type=request.analysis_type.value,
+            prompt=request.prompt,
+            already_clean=True
+        )
+    
+    if not analysis_result['success']:
         raise HTTPException(
-            status_code=500,
-            detail="Internal server error during text analysis"
+            status_code=422,
+            detail=analysis_result['message']
         )
+    
+    # Ensure confidence is properly capped at 100%
+    result = analysis_result['result']
+    if 'confidence' in result:
+        result['confidence'] = min(result['confidence'], 100.0)
+    if not cache_hit:
+        # Re-assigning a hit would restart its TTL, so hot entries never expired
+        _analysis_cache[cache_key] = analysis_result
+    
+    # Store analysis result in Firestore if document_id is provided
+    if request.document_id:
+        try:
+            await firestore_service.enqueue_analysis(
+                document_id=request.document_id,
+                analysis_type=request.analysis_type,
+                result=result,
+                prompt=request.prompt
+            )
+            logger.info(f"Queued analysis result for document: {request.document_id}")
+        except Exception as e:
+            logger.error(f"Failed to store analysis result: {str(e)}")
+            # Continue without storing if Firestore fails
+    
+    return AnalysisResponse(
+        analysis_type=request.analysis_type,
+        result=result,
+        success=True,
+        message=analysis_result['message'],
+        confidence=result.get('confidence')
+    )
 
 @router.get("/analysis-types")
 async def get_analysis_types():
     """Get available analysis types"""
-    return {
-        "analysis_types": [
-            {
-                "type": "summarize",
-                "name": "Text Summarization",
-                "description": "Generate a concise summary using Cohere AI",
-                "model": "cohere/summarize-xlarge"
-            },
-            {
-                "type": "sentiment",
-                "name": "Sentiment Analysis",
-                "description": "Analyze the emotional tone using Cohere AI",
-                "model": "cohere/command"
-            },
-            {
-                "type": "question",
-                "name": "Question Answering",
-                "description": "Answer questions about the text using Cohere AI",
-                "model": "cohere/command"
-            }
-        ]
-    }
+    return Response(content=_ANALYSIS_TYPES_JSON, media_type="application/json")
 
 @router.get("/health")
 async def health_check():
     """Health check endpoint for analysis service"""
-    return {"status": "healthy", "service": "analysis"} 
\ No newline at end of file
+    return Response(content=_HEALTH_JSON, media_type="application/json")
\ No newline at end of file
@@ -1,31 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.models.schemas import UserCreate, UserLogin, UserResponse, Token, ForgotPasswordRequest, ResetPasswordRequest, PasswordResetResponse
+from app.api.deps import get_auth, get_current_user
 from app.services.auth_service import AuthService
 from datetime import timedelta
 
 router = APIRouter()
-security = HTTPBearer()
-auth_service = AuthService()
 
 @router.post("/register", response_model=UserResponse)
-async def register(user_data: UserCreate):
+async def register(user_data: UserCreate, auth_service: AuthService = Depends(get_auth)):
     """
     Register a new user
     """
-    try:
-        user = await auth_service.register_user(user_data)
-        return user
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Registration failed: {str(e)}"
-        )
+    user = await auth_service.register_user(user_data)
+    return user
 
 @router.post("/login", response_model=Token)
-async def login(user_data: UserLogin):
+async def login(user_data: UserLogin, auth_service: AuthService = Depends(get_auth)):
     """
     Login user and return JWT token
     """
@@ -45,91 +35,64 @@ async def login(user_data: UserLogin):
     return Token(access_token=access_token, user=user)
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def read_current_user(current_user: UserResponse = Depends(get_current_user)):
     """
     Get current user information
     """
-    token = credentials.credentials
-    user = await auth_service.get_current_user(token)
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    return user
+    return current_user
 
 @router.post("/refresh")
-async def refresh_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def refresh_token(current_user: UserResponse = Depends(get_current_user),
+                        auth_service: AuthService = Depends(get_auth)):
     """
     Refresh JWT token
     """
-    token = credentials.credentials
-    user = await auth_service.get_current_user(token)
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
     access_token_expires = timedelta(minutes=30)
     access_token = auth_service.create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data={"sub": current_user.email}, expires_delta=access_token_expires
     )
     
-    return Token(access_token=access_token, user=user)
+    # The new token belongs to a user we just verified, so its first use is a cache hit
+    auth_service.remember_token(access_token, current_user)
+    
+    return Token(access_token=access_token, user=current_user)
 
 @router.post("/forgot-password", response_model=PasswordResetResponse)
-async def forgot_password(request: ForgotPasswordRequest):
+async def forgot_password(request: ForgotPasswordRequest, auth_service: AuthService = Depends(get_auth)):
     """
     Request password reset for a user
     """
-    try:
-        success = await auth_service.request_password_reset(request.email)
-        if success:
-            return PasswordResetResponse(
-                message="If an account with this email exists, a password reset link has been sent.",
-                success=True
-            )
-        else:
-            # Always return success to prevent email enumeration
-            return PasswordResetResponse(
-                message="If an account with this email exists, a password reset link has been sent.",
-                success=True
-            )
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Password reset request failed: {str(e)}"
+    success = await auth_service.request_password_reset(request.email)
+    if success:
+        return PasswordResetResponse(
+            message="If an account with this email exists, a password reset link has been sent.",
+            success=True
+        )
+    else:
+        # Always return success to prevent email enumeration
+        return PasswordResetResponse(
+            message="If an account with this email exists, a password reset link has been sent.",
+            success=True
         )
 
 @router.post("/reset-password", response_model=PasswordResetResponse)
-async def reset_password(request: ResetPasswordRequest):
+async def reset_password(request: ResetPasswordRequest, auth_service: AuthService = Depends(get_auth)):
     """
     Reset user password using reset token
     """
-    try:
-        success = await auth_service.reset_password(
-            request.email, 
-            request.reset_token, 
-            request.new_password
+    success = await auth_service.reset_password(
+        request.email, 
+        request.reset_token, 
+        request.new_password
+    )
+    
+    if success:
+        return PasswordResetResponse(
+            message="Password has been reset successfully. You can now login with your new password.",
+            success=True
         )
-        
-        if success:
-            return PasswordResetResponse(
-                message="Password has been reset successfully. You can now login with your new password.",
-                success=True
-            )
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid or expired reset token"
-            )
-    except HTTPException:
-        raise
-    except Exception as e:
+    else:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Password reset failed: {str(e)}"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid or expired reset token"
         )
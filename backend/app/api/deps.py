@@ -0,0 +1,51 @@
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from app.services.ai_analysis_service import AIAnalysisService
+from app.services.alternative_ai_service import AlternativeAIAnalysisService
+from app.services.batched_ai_service import BatchedAIService
+from app.services.firestore_service import FirestoreService
+from app.services.ocr_service import OCRService
+from app.services.auth_service import AuthService
+from app.models.schemas import UserResponse
+
+# Services are constructed once in the app lifespan (see app.main) and shared
+# across requests through these dependencies.
+
+def get_ai(request: Request) -> AIAnalysisService:
+    """Hugging Face analysis service"""
+    return request.app.state.ai
+
+def get_alt(request: Request) -> AlternativeAIAnalysisService:
+    """Cohere analysis service"""
+    return request.app.state.alt
+
+def get_auth(request: Request) -> AuthService:
+    """Authentication service"""
+    return request.app.state.auth
+
+def get_batcher(request: Request) -> BatchedAIService:
+    """Micro-batching front for the Cohere analysis service"""
+    return request.app.state.batcher
+
+def get_fs(request: Request) -> FirestoreService:
+    """Firestore service"""
+    return request.app.state.fs
+
+def get_ocr(request: Request) -> OCRService:
+    """OCR.space service"""
+    return request.app.state.ocr
+
+security = HTTPBearer()
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security),
+                           auth_service: AuthService = Depends(get_auth)) -> UserResponse:
+    """Dependency to get current authenticated user"""
+    token = credentials.credentials
+    user = await auth_service.get_current_user(token)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
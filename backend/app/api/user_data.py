@@ -1,165 +1,218 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from typing import List, Dict, Any
-from app.services.auth_service import AuthService
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from typing import Any, Dict, List, Optional
+from datetime import datetime, timedelta
+import asyncio
+import hashlib
+import logging
 from app.services.firestore_service import FirestoreService
+from app.api.deps import get_current_user, get_fs
 from app.models.schemas import UserResponse
+from app.utils.responses import AppJSONResponse
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
-security = HTTPBearer()
-auth_service = AuthService()
-firestore_service = FirestoreService()
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> UserResponse:
-    """Dependency to get current authenticated user"""
-    token = credentials.credentials
-    user = await auth_service.get_current_user(token)
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    return user
+# Browsers keep the body and revalidate with If-None-Match on every request
+EXTRACTIONS_CACHE_CONTROL = "private, no-cache"
+
+def make_etag(*parts: Any) -> str:
+    """Build a strong ETag from the values a response depends on"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+def version_of(updated_at: Optional[datetime]) -> int:
+    """Microsecond timestamp used as an ETag component (0 if unknown)"""
+    return int(updated_at.timestamp() * 1_000_000) if updated_at else 0
 
-@router.get("/extractions", response_model=List[Dict[str, Any]])
+# Enough of a document to check ownership and build its ETag
+DOCUMENT_VERSION_FIELDS = ['user_id', 'created_at', 'updated_at']
+
+def page_etag(user_id: str, limit: int, fields: Optional[str], rows: List[Dict[str, Any]]) -> str:
+    """ETag of a list page from the ID and updated_at of its rows
+
+    Paging is by cursor, so a page only changes when one of its own rows (or
+    the one-past-the-end row that decides next_cursor) is added, removed or
+    updated; analysis writes bump the parent's updated_at.
+    """
+    return make_etag(user_id, limit, fields,
+                     *(f"{row['id']}@{version_of(row.get('updated_at'))}" for row in rows))
+
+@router.get("/extractions")
 async def get_user_extractions(
+    request: Request,
     limit: int = 20,
-    current_user: UserResponse = Depends(get_current_user)
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: UserResponse = Depends(get_current_user),
+    firestore_service: FirestoreService = Depends(get_fs)
 ):
     """
-    Get all extraction documents for the current user
+    Get a page of extraction documents for the current user, newest first
+    
+    Returns {"items": [...], "next_cursor": str | None}; pass next_cursor back as
+    `cursor` for the following page. next_cursor is None on the last page. `fields` is an optional comma-separated
+    projection (e.g. "extracted_text,analyses_count") for list views.
+    
+    Answers 304 Not Modified when If-None-Match matches the page's current
+    version, checked with a query projected to updated_at only.
     """
-    try:
-        print(f"🔍 Getting extractions for user: {current_user.id}")
-        print(f"🔍 User email: {current_user.email}")
-        extractions = await firestore_service.get_user_extractions(current_user.id, limit)
-        print(f"📄 Found {len(extractions)} extractions")
-        return extractions
-    except Exception as e:
-        print(f"❌ Error getting extractions: {str(e)}")
+    start_after = start_after_id = None
+    if cursor:
+        # "<created_at ISO>|<document id>"; a bare timestamp is still accepted
+        created, _, start_after_id = cursor.partition("|")
+        try:
+            start_after = datetime.fromisoformat(created)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+    projection = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+    if projection:
+        # Like created_at for paging, updated_at always comes along for the ETag
+        projection = list(dict.fromkeys([*projection, 'updated_at']))
+    
+    page = dict(start_after=start_after, start_after_id=start_after_id or None)
+    
+    # One extra row tells whether another page exists without a second query
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        versions = await firestore_service.get_user_extractions(
+            current_user.id, limit + 1, fields=['updated_at'], **page
+        )
+        etag = page_etag(current_user.id, limit, fields, versions)
+        if if_none_match == etag:
+            return Response(status_code=304, headers={
+                "ETag": etag, "Cache-Control": EXTRACTIONS_CACHE_CONTROL
+            })
+    
+    logger.debug("Getting extractions for user: %s (%s)", current_user.id, current_user.email)
+    extractions = await firestore_service.get_user_extractions(
+        current_user.id, limit + 1, fields=projection, **page
+    )
+    logger.debug("Found %d extractions", len(extractions))
+    
+    headers = {"ETag": page_etag(current_user.id, limit, fields, extractions),
+               "Cache-Control": EXTRACTIONS_CACHE_CONTROL}
+    
+    next_cursor = None
+    if len(extractions) > limit:
+        extractions = extractions[:limit]
+        last_created = extractions[-1].get('created_at')
+        if isinstance(last_created, datetime):
+            next_cursor = f"{last_created.isoformat()}|{extractions[-1]['id']}"
+    
+    # Firestore documents go straight to orjson instead of through jsonable_encoder
+    return AppJSONResponse({"items": extractions, "next_cursor": next_cursor}, headers=headers)
+
+def document_etag(document_id: str, document: Dict[str, Any]) -> str:
+    return make_etag(document_id, version_of(document.get('updated_at') or document.get('created_at')))
+
+def check_owner(document: Optional[Dict[str, Any]], current_user: UserResponse):
+    """Raise 404 for a missing document and 403 for someone else's"""
+    if not document:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to retrieve user extractions: {str(e)}"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found"
+        )
+    
+    # Check if the document belongs to the current user
+    if document.get('user_id') != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied"
         )
 
 @router.get("/extractions/{document_id}")
 async def get_user_extraction(
     document_id: str,
-    current_user: UserResponse = Depends(get_current_user)
+    request: Request,
+    current_user: UserResponse = Depends(get_current_user),
+    firestore_service: FirestoreService = Depends(get_fs)
 ):
     """
     Get a specific extraction document for the current user
+    
+    A conditional request is first checked against the parent's version
+    fields alone, so a 304 skips the analyses and the offloaded text.
     """
-    try:
-        document = await firestore_service.get_extraction_document(document_id)
-        if not document:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Document not found"
-            )
-        
-        # Check if the document belongs to the current user
-        if document.get('user_id') != current_user.id:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Access denied"
-            )
-        
-        return document
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to retrieve document: {str(e)}"
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        version = await firestore_service.get_extraction_document(
+            document_id, include_analyses=False, include_text=False, fields=DOCUMENT_VERSION_FIELDS
         )
+        check_owner(version, current_user)
+        etag = document_etag(document_id, version)
+        if if_none_match == etag:
+            return Response(status_code=304, headers={
+                "ETag": etag, "Cache-Control": EXTRACTIONS_CACHE_CONTROL
+            })
+    
+    document = await firestore_service.get_extraction_document(document_id)
+    check_owner(document, current_user)
+    
+    headers = {"ETag": document_etag(document_id, document), "Cache-Control": EXTRACTIONS_CACHE_CONTROL}
+    return AppJSONResponse(document, headers=headers)
 
 @router.delete("/extractions/{document_id}")
 async def delete_user_extraction(
     document_id: str,
-    current_user: UserResponse = Depends(get_current_user)
+    current_user: UserResponse = Depends(get_current_user),
+    firestore_service: FirestoreService = Depends(get_fs)
 ):
     """
     Delete a specific extraction document for the current user
     """
-    try:
-        # First check if the document belongs to the current user
-        document = await firestore_service.get_extraction_document(document_id)
-        if not document:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Document not found"
-            )
-        
-        if document.get('user_id') != current_user.id:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Access denied"
-            )
-        
-        success = await firestore_service.delete_extraction_document(document_id)
-        if not success:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to delete document"
-            )
-        
-        return {"message": "Document deleted successfully"}
-    except HTTPException:
-        raise
-    except Exception as e:
+    # First check if the document belongs to the current user
+    document = await firestore_service.get_extraction_document(document_id, include_analyses=False,
+                                                                include_text=False)
+    if not document:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found"
+        )
+    
+    if document.get('user_id') != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied"
+        )
+    
+    success = await firestore_service.delete_extraction_document(document_id)
+    if not success:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to delete document: {str(e)}"
+            detail="Failed to delete document"
         )
+    
+    return {"message": "Document deleted successfully"}
 
 @router.get("/stats")
-async def get_user_stats(current_user: UserResponse = Depends(get_current_user)):
+async def get_user_stats(
+    current_user: UserResponse = Depends(get_current_user),
+    firestore_service: FirestoreService = Depends(get_fs)
+):
     """
     Get user statistics (total extractions, recent activity, etc.)
     """
-    try:
-        extractions = await firestore_service.get_user_extractions(current_user.id, 1000)  # Get all for stats
-        
-        total_extractions = len(extractions)
-        total_analyses = sum(len(doc.get('analyses', [])) for doc in extractions)
-        
-        # Get recent activity (last 7 days)
-        from datetime import datetime, timedelta
-        week_ago = datetime.utcnow().replace(tzinfo=None) - timedelta(days=7)
-        recent_extractions = []
-        
-        for doc in extractions:
-            created_at = doc.get('created_at')
-            if created_at:
-                # Handle both Firestore timestamp and Python datetime
-                if hasattr(created_at, 'timestamp'):
-                    # Firestore timestamp
-                    doc_datetime = datetime.fromtimestamp(created_at.timestamp())
-                else:
-                    # Python datetime
-                    doc_datetime = created_at
-                
-                # Ensure timezone-naive for comparison
-                if hasattr(doc_datetime, 'replace'):
-                    doc_datetime = doc_datetime.replace(tzinfo=None)
-                
-                if doc_datetime > week_ago:
-                    recent_extractions.append(doc)
-        
-        stats = {
-            "total_extractions": total_extractions,
-            "total_analyses": total_analyses,
-            "recent_extractions": len(recent_extractions),
-            "user_id": current_user.id,
-            "user_email": current_user.email,
-            "user_name": current_user.full_name
-        }
-        
-        return stats
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to retrieve user stats: {str(e)}"
-        )
+    week_ago = datetime.utcnow().replace(tzinfo=None) - timedelta(days=7)
+    
+    # Aggregate server-side instead of pulling every document to count it;
+    # the created_at range filter needs the composite index in firestore.indexes.json
+    total_extractions, recent_extractions, total_analyses = await asyncio.gather(
+        firestore_service.count_user_extractions(current_user.id),
+        firestore_service.count_user_extractions_since(current_user.id, week_ago),
+        firestore_service.sum_user_analyses(current_user.id)
+    )
+    
+    stats = {
+        "total_extractions": total_extractions,
+        "total_analyses": total_analyses,
+        "recent_extractions": recent_extractions,
+        "user_id": current_user.id,
+        "user_email": current_user.email,
+        "user_name": current_user.full_name
+    }
+    
+    return stats
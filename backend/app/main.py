@@ -1,24 +1,70 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from dotenv import load_dotenv
+from app.utils.env import load_env
+import logging
+import orjson
 import os
 
 from app.api import text_extraction, analysis, auth, user_data
+from app.services.ai_analysis_service import AIAnalysisService
+from app.services.alternative_ai_service import AlternativeAIAnalysisService
+from app.services.auth_service import AuthService
+from app.services.batched_ai_service import BatchedAIService
+from app.services.firestore_service import FirestoreService
+from app.services.ocr_service import OCRService
+from app.utils.error_middleware import UnhandledErrorMiddleware
 from app.utils.firebase_config import initialize_firebase
+from app.utils.http_client import create_http_client
+from app.utils.responses import AppJSONResponse
 
 # Load environment variables
-load_dotenv()
+load_env()
+
+# Configure application logging once, here; uvicorn owns its own loggers and
+# a --log-config that sets up the root logger takes precedence
+app_logger = logging.getLogger("app")
+app_logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+if not logging.getLogger().handlers:
+    app_logger.addHandler(logging.StreamHandler())
 
 # Initialize Firebase
 initialize_firebase()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build shared services once at startup so requests never construct them"""
+    # One connection pool for outbound API calls, shared by the services
+    app.state.http = create_http_client()
+    app.state.ai = AIAnalysisService(http_client=app.state.http)
+    app.state.alt = AlternativeAIAnalysisService(http_client=app.state.http)
+    app.state.fs = FirestoreService()
+    await app.state.fs.warm_up()
+    app.state.ocr = OCRService(http_client=app.state.http)
+    app.state.auth = AuthService(app.state.fs)
+    app.state.batcher = BatchedAIService(app.state.alt)
+    app.state.batcher.start()
+    app.state.fs.start_analysis_writer()
+    yield
+    await app.state.batcher.stop()
+    await app.state.fs.stop_analysis_writer()
+    await app.state.ai.aclose()
+    await app.state.alt.aclose()
+    await app.state.ocr.aclose()
+    await app.state.http.aclose()
+
 # Create FastAPI app
 app = FastAPI(
     title="InsightLens API",
     description="A Web-Based Text Extraction and Analysis Platform",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=AppJSONResponse,
+    lifespan=lifespan
 )
 
+# Unhandled exceptions become a logged 500; added before CORS so it runs inside it
+app.add_middleware(UnhandledErrorMiddleware)
+
 # Configure CORS
 origins = os.getenv("CORS_ORIGINS", "http://localhost:5173").split(",")
 app.add_middleware(
@@ -35,12 +81,15 @@ app.include_router(user_data.router, prefix="/api/user", tags=["user-data"])
 app.include_router(text_extraction.router, prefix="/api", tags=["text-extraction"])
 app.include_router(analysis.router, prefix="/api", tags=["analysis"])
 
+_ROOT_JSON = orjson.dumps({"message": "InsightLens API is running", "version": "1.0.0"})
+_HEALTH_JSON = orjson.dumps({"status": "healthy", "service": "InsightLens API"})
+
 @app.get("/")
 async def root():
     """Root endpoint for health check"""
-    return {"message": "InsightLens API is running", "version": "1.0.0"}
+    return Response(content=_ROOT_JSON, media_type="application/json")
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "service": "InsightLens API"} 
\ No newline at end of file
+    return Response(content=_HEALTH_JSON, media_type="application/json") 
\ No newline at end of file
@@ -1,8 +1,7 @@
-from pydantic import BaseModel, validator
+from pydantic import BaseModel, field_validator
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from enum import Enum
-import re
 
 class AnalysisType(str, Enum):
     """Enumeration of available analysis types"""
@@ -24,7 +23,8 @@ class UserCreate(BaseModel):
     password: str
     full_name: str
     
-    @validator('email')
+    @field_validator('email')
+    @classmethod
     def validate_email(cls, v):
         return validate_email(v)
 
@@ -33,7 +33,8 @@ class UserLogin(BaseModel):
     email: str
     password: str
     
-    @validator('email')
+    @field_validator('email')
+    @classmethod
     def validate_email(cls, v):
         return validate_email(v)
 
@@ -41,7 +42,8 @@ class ForgotPasswordRequest(BaseModel):
     """Model for forgot password request"""
     email: str
     
-    @validator('email')
+    @field_validator('email')
+    @classmethod
     def validate_email(cls, v):
         return validate_email(v)
 
@@ -51,7 +53,8 @@ class ResetPasswordRequest(BaseModel):
     reset_token: str
     new_password: str
     
-    @validator('email')
+    @field_validator('email')
+    @classmethod
     def validate_email(cls, v):
         return validate_email(v)
 
@@ -77,6 +80,7 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     """Model for token payload data"""
     email: Optional[str] = None
+    exp: Optional[int] = None
 
 # Existing Models (Updated to include user_id)
 class TextExtractionResponse(BaseModel):
@@ -133,8 +137,12 @@ class ExtractionDocument(BaseModel):
     user_id: str
     created_at: datetime
     image_url: Optional[str] = None
-    extracted_text: str
+    extracted_text: Optional[str] = None  # absent when offloaded to text_path
+    text_path: Optional[str] = None
+    text_preview: Optional[str] = None
+    text_length: int = 0
     analyses: List[AnalysisRecord] = []
+    analyses_count: int = 0
 
 class UserDocument(BaseModel):
     """Model for storing user documents in Firestore"""
@@ -1,51 +1,94 @@
+import asyncio
+import copy
+import hashlib
+import logging
 import os
-import requests
-import json
-from typing import Dict, Any, Optional
-from dotenv import load_dotenv
+import httpx
+import orjson
+from operator import itemgetter
+from typing import Dict, Any, List, Optional
+from cachetools import TTLCache
+from app.utils.env import load_env
+from app.utils.http_client import create_http_client
+from app.utils.text import has_meaningful_words
 
 # Load environment variables
-load_dotenv()
+load_env()
+
+logger = logging.getLogger(__name__)
+
+# Seconds a successful Hugging Face result is reused for the same model/text/prompt
+HF_RESULT_CACHE_TTL = int(os.getenv("HF_RESULT_CACHE_TTL", "3600"))
+
+# Texts sent per sentiment inference call by analyze_sentiments_batch
+HF_SENTIMENT_BATCH_SIZE = int(os.getenv("HF_SENTIMENT_BATCH_SIZE", "16"))
+
+# Attempts per Hugging Face call while the model is loading or the gateway fails,
+# and the longest single wait between them
+HF_MAX_ATTEMPTS = int(os.getenv("HF_MAX_ATTEMPTS", "3"))
+HF_MAX_RETRY_WAIT = float(os.getenv("HF_MAX_RETRY_WAIT", "10"))
+_RETRY_STATUSES = {502, 503, 504}
 
 def clean_text(text):
     """Clean OCR text by removing duplicate lines, excessive whitespace, and joining into a single paragraph."""
     if not text:
         return ""
     
-    # Split into lines and clean each line
-    lines = []
-    for line in text.splitlines():
-        line = line.strip()
-        if line and len(line) > 1:  # Only keep lines with meaningful content
-            lines.append(line)
+    # One pass over the lines: collapse whitespace and drop trivial lines;
+    # dict.fromkeys then removes duplicates while preserving order
+    lines = (' '.join(line.split()) for line in text.splitlines())
+    unique_lines = dict.fromkeys(line for line in lines if len(line) > 1)
     
-    # Remove duplicates while preserving order
-    unique_lines = []
-    seen = set()
-    for line in lines:
-        if line not in seen:
-            unique_lines.append(line)
-            seen.add(line)
-    
-    # Join with proper spacing
-    cleaned_text = ' '.join(unique_lines)
-    
-    # Remove excessive whitespace
-    import re
-    cleaned_text = re.sub(r'\s+', ' ', cleaned_text)
-    
-    return cleaned_text.strip()
+    return ' '.join(unique_lines)
+
+def _preview(text: str, length: int) -> str:
+    """Return the first length characters of text, with an ellipsis if cut"""
+    if len(text) <= length:
+        return text
+    return text[:length] + '...'
 
 class AIAnalysisService:
     """Service for AI-powered text analysis using Hugging Face Inference API and TabularisAI for sentiment"""
     
-    def __init__(self):
+    # Characters of cleaned text each model receives
+    TEXT_LIMITS = {
+        'summarize': 2000,
+        'sentiment': 512,
+        'question': 1000
+    }
+    
+    # Below these lengths the handlers reject the text; cleaning never lengthens it
+    MIN_TEXT_LENGTHS = {
+        'summarize': 20,
+        'sentiment': 5,
+        'question': 10
+    }
+    
+    _SUMMARIZE_PARAMS = {
+        "max_length": 150,
+        "min_length": 30,
+        "do_sample": False,
+        "num_beams": 4,
+        "early_stopping": True,
+        "length_penalty": 2.0,
+        "no_repeat_ngram_size": 3
+    }
+    
+    # Map labels to user-friendly names and their emoji
+    _LABEL_TO_RESULT = {
+        'LABEL_0': ('Negative', "😞"),
+        'LABEL_1': ('Neutral', "😐"),
+        'LABEL_2': ('Positive', "😊")
+    }
+    _NEUTRAL_RESULT = ('Neutral', "😐")
+    
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
         self.api_token = os.getenv("HUGGING_FACE_API_TOKEN")
         self.api_url = "https://api-inference.huggingface.co/models"
         
         # Allow running without API token for development/testing
         if not self.api_token:
-            print("Warning: HUGGING_FACE_API_TOKEN not set. Some features may not work.")
+            logger.warning("HUGGING_FACE_API_TOKEN not set. Some features may not work.")
             self.api_token = "demo_token"  # Fallback for development
         
         # Updated model configurations for better performance
@@ -54,13 +97,31 @@ class AIAnalysisService:
             'question': 'deepset/roberta-base-squad2',
             'sentiment': 'cardiffnlp/twitter-roberta-base-sentiment-latest'
         }
+        self._summarize_url = f"{self.api_url}/{self.models['summarize']}"
+        self._sentiment_url = f"{self.api_url}/{self.models['sentiment']}"
+        self._question_url = f"{self.api_url}/{self.models['question']}"
         
         self.headers = {
             "Authorization": f"Bearer {self.api_token}",
             "Content-Type": "application/json"
         }
+        
+        # Pooled keep-alive client; an injected one is shared app-wide and
+        # closed by its owner, otherwise this service owns its own. The auth
+        # headers go on each request so a shared client never carries them.
+        self._owns_client = http_client is None
+        self._client = http_client or create_http_client()
+    
+        # blake2b(type|model|text|prompt) -> successful result
+        self._cache = TTLCache(maxsize=1024, ttl=HF_RESULT_CACHE_TTL)
+    
+    async def aclose(self):
+        """Close the pooled HTTP client if this service created it"""
+        if self._owns_client:
+            await self._client.aclose()
     
-    async def analyze_text(self, text: str, analysis_type: str, prompt: Optional[str] = None) -> Dict[str, Any]:
+    async def analyze_text(self, text: str, analysis_type: str, prompt: Optional[str] = None,
+                           already_clean: bool = False) -> Dict[str, Any]:
         """
         Analyze text using the specified analysis type
         
@@ -68,54 +129,195 @@ class AIAnalysisService:
             text: Text to analyze
             analysis_type: Type of analysis ('summarize', 'sentiment', 'question')
             prompt: Optional prompt for question-answering or summarization
+            already_clean: Text has already been through clean_text; skip it
             
         Returns:
             dict: Analysis results
         """
+        # Too short to pass the handler's check even uncleaned: skip the cleaning
+        if len(text or '') < self.MIN_TEXT_LENGTHS.get(analysis_type, 0):
+            return await self._dispatch(text or '', analysis_type, prompt)
+        
+        # Text is cleaned exactly once here; the handlers expect cleaned input
+        text = self._bound_input(text, [analysis_type])
+        if not already_clean:
+            text = clean_text(text)
+        return await self._analyze_cleaned(text, analysis_type, prompt)
+    
+    async def _analyze_cleaned(self, text: str, analysis_type: str, prompt: Optional[str] = None) -> Dict[str, Any]:
+        if analysis_type == 'sentiment':
+            text = self._sentiment_input(text)
+        key = self._cache_key(text, analysis_type, prompt)
+        cached = self._cache.get(key)
+        if cached is not None:
+            # Callers may adjust the result dict, so never hand out the cached one
+            return copy.deepcopy(cached)
+        
         try:
-            if analysis_type == 'summarize':
-                # Use a detailed default prompt if none provided
-                if not prompt:
-                    prompt = (
-                        "Create a concise, well-structured summary of the extracted text only. "
-                        "Focus on the key points, main ideas, and important details from the provided content. "
-                        "Use clear, simple language and avoid repetition. "
-                        "Do not add any external information or assumptions. "
-                        "Keep the summary informative but brief."
-                    )
-                # Clean the text for summarization
-                text = clean_text(text)
-                return await self._summarize_text(text)
-            elif analysis_type == 'sentiment':
-                return await self._analyze_sentiment(text)
-            elif analysis_type == 'question':
-                if not prompt:
-                    return {
-                        'success': False,
-                        'result': None,
-                        'message': 'Prompt is required for question analysis'
-                    }
-                return await self._answer_question(text, prompt)
+            result = await self._dispatch(text, analysis_type, prompt)
+            if result.get('success'):
+                self._cache[key] = copy.deepcopy(result)
+            return result
+        except Exception as e:
+            return {
+                'success': False,
+                'result': None,
+                'message': f'Analysis failed: {str(e)}'
+            }
+    
+    async def analyze_text_multi(self, text: str, analysis_types: List[str],
+                                 prompt: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Run several analyses of the same text concurrently
+        
+        Args:
+            text: Text to analyze
+            analysis_types: Analysis types to run (duplicates are ignored)
+            prompt: Optional prompt, shared by the analyses that use it
+            
+        Returns:
+            dict: Analysis results keyed by analysis type
+        """
+        analysis_types = list(dict.fromkeys(analysis_types))
+        text = clean_text(self._bound_input(text, analysis_types))
+        results = await asyncio.gather(
+            *(self._analyze_cleaned(text, analysis_type, prompt) for analysis_type in analysis_types)
+        )
+        return dict(zip(analysis_types, results))
+    
+    async def analyze_sentiments_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """
+        Analyze the sentiment of several texts with one inference call per chunk
+        
+        Args:
+            texts: Texts to analyze
+            
+        Returns:
+            list: One analysis result per text, in input order
+        """
+        minimum = self.MIN_TEXT_LENGTHS['sentiment']
+        texts = [self._sentiment_input(clean_text(self._bound_input(text, ['sentiment'])))
+                 if len(text or '') >= minimum else ''
+                 for text in texts]
+        results: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+        
+        pending = []
+        for index, text in enumerate(texts):
+            cached = self._cache.get(self._cache_key(text, 'sentiment'))
+            if cached is not None:
+                results[index] = copy.deepcopy(cached)
+            elif len(text) < minimum:
+                results[index] = {
+                    'success': False,
+                    'result': None,
+                    'message': 'Insufficient text for sentiment analysis'
+                }
             else:
+                pending.append(index)
+        
+        chunks = [pending[i:i + HF_SENTIMENT_BATCH_SIZE]
+                  for i in range(0, len(pending), HF_SENTIMENT_BATCH_SIZE)]
+        batches = await asyncio.gather(
+            *(self._analyze_sentiment_chunk([texts[index] for index in chunk]) for chunk in chunks)
+        )
+        
+        for chunk, batch in zip(chunks, batches):
+            for index, result in zip(chunk, batch):
+                if result.get('success'):
+                    self._cache[self._cache_key(texts[index], 'sentiment')] = copy.deepcopy(result)
+                results[index] = result
+        return results
+    
+    def _bound_input(self, text: str, analysis_types: List[str]) -> str:
+        """
+        Cut raw input down before cleaning so huge OCR dumps cost O(limit)
+        
+        Keeps 4x the largest model limit to absorb what cleaning removes. Unknown
+        analysis types leave the text untouched.
+        """
+        limits = [self.TEXT_LIMITS.get(analysis_type) for analysis_type in analysis_types]
+        if not text or not limits or None in limits:
+            return text
+        bound = 4 * max(limits)
+        return text[:bound] if len(text) > bound else text
+    
+    def _sentiment_input(self, text: str) -> str:
+        """
+        Cut cleaned text to what the sentiment model receives
+        
+        Both the single and the batch path key the cache on this, so the same
+        text hits the same entry whichever way it was analyzed.
+        """
+        return text[:self.TEXT_LIMITS['sentiment']]
+    
+    async def _post(self, url: str, payload: Any) -> Any:
+        """
+        POST a payload to a model and return the decoded response
+        
+        A 503 while the model is cold-loading carries an estimated_time, which is
+        honored (capped at HF_MAX_RETRY_WAIT) before retrying; other gateway errors
+        back off exponentially. The last response's error is raised as usual.
+        """
+        content = orjson.dumps(payload)
+        for attempt in range(HF_MAX_ATTEMPTS):
+            response = await self._client.post(url, content=content, headers=self.headers)
+            if response.status_code not in _RETRY_STATUSES or attempt == HF_MAX_ATTEMPTS - 1:
+                break
+            
+            wait = 2 ** attempt
+            if response.status_code == 503:
+                try:
+                    wait = float(orjson.loads(response.content).get('estimated_time', wait))
+                except (orjson.JSONDecodeError, AttributeError, TypeError, ValueError):
+                    pass
+            wait = min(wait, HF_MAX_RETRY_WAIT)
+            logger.info("Hugging Face returned %d, retrying in %.1fs", response.status_code, wait)
+            await asyncio.sleep(wait)
+        
+        response.raise_for_status()
+        return orjson.loads(response.content)
+    
+    def _cache_key(self, text: str, analysis_type: str, prompt: Optional[str] = None) -> str:
+        model = self.models.get(analysis_type, '')
+        return hashlib.blake2b(
+            f"{analysis_type}|{model}|{text}|{prompt or ''}".encode(), digest_size=16
+        ).hexdigest()
+    
+    async def _dispatch(self, text: str, analysis_type: str, prompt: Optional[str] = None) -> Dict[str, Any]:
+        """Route a request to the handler for its analysis type"""
+        if analysis_type == 'summarize':
+            # Use a detailed default prompt if none provided
+            if not prompt:
+                prompt = (
+                    "Create a concise, well-structured summary of the extracted text only. "
+                    "Focus on the key points, main ideas, and important details from the provided content. "
+                    "Use clear, simple language and avoid repetition. "
+                    "Do not add any external information or assumptions. "
+                    "Keep the summary informative but brief."
+                )
+            return await self._summarize_text(text)
+        elif analysis_type == 'sentiment':
+            return await self._analyze_sentiment(text)
+        elif analysis_type == 'question':
+            if not prompt:
                 return {
                     'success': False,
                     'result': None,
-                    'message': f'Unknown analysis type: {analysis_type}'
+                    'message': 'Prompt is required for question analysis'
                 }
-        except Exception as e:
+            return await self._answer_question(text, prompt)
+        else:
             return {
                 'success': False,
                 'result': None,
-                'message': f'Analysis failed: {str(e)}'
+                'message': f'Unknown analysis type: {analysis_type}'
             }
     
     async def _summarize_text(self, text: str) -> Dict[str, Any]:
         """Summarize text using the BART model"""
         try:
-            model_url = f"{self.api_url}/{self.models['summarize']}"
+            model_url = self._summarize_url
             
-            # Clean and prepare text
-            text = clean_text(text)
             if len(text) < 20:
                 return {
                     'success': False,
@@ -123,36 +325,35 @@ class AIAnalysisService:
                     'message': 'Insufficient text for summarization'
                 }
             
+            # Already about as short as the model's summaries: skip the round-trip.
+            # Cleaned text is single-space separated, so spaces + 1 is the word count.
+            if len(text) <= 200 or text.count(' ') < 40:
+                text_len = len(text)
+                return {
+                    'success': True,
+                    'result': {
+                        'summary': text,
+                        'original_length': text_len,
+                        'summary_length': text_len,
+                        'compression_ratio': 100.0
+                    },
+                    'message': 'Text short enough, returned verbatim'
+                }
+            
             # Limit text length for better performance
             if len(text) > 2000:
                 text = text[:2000] + "..."
             
             payload = {
                 "inputs": text,
-                "parameters": {
-                    "max_length": 150,
-                    "min_length": 30,
-                    "do_sample": False,
-                    "num_beams": 4,
-                    "early_stopping": True,
-                    "length_penalty": 2.0,
-                    "no_repeat_ngram_size": 3
-                }
+                "parameters": self._SUMMARIZE_PARAMS
             }
             
-            print(f"Summarization - Text length: {len(text)}")
-            
-            response = requests.post(
-                model_url,
-                headers=self.headers,
-                json=payload,
-                timeout=30
-            )
+            logger.debug("Summarization - text length: %d", len(text))
             
-            response.raise_for_status()
-            result = response.json()
+            result = await self._post(model_url, payload)
             
-            print(f"Summarization Response: {result}")
+            logger.debug("Summarization response: %s", result)
             
             if isinstance(result, list) and len(result) > 0:
                 summary = result[0].get('summary_text', '')
@@ -163,13 +364,15 @@ class AIAnalysisService:
                         'message': 'Generated summary is empty'
                     }
                 
+                text_len = len(text)
+                summary_len = len(summary)
                 return {
                     'success': True,
                     'result': {
                         'summary': summary.strip(),
-                        'original_length': len(text),
-                        'summary_length': len(summary),
-                        'compression_ratio': round(len(summary) / len(text) * 100, 1)
+                        'original_length': text_len,
+                        'summary_length': summary_len,
+                        'compression_ratio': round(summary_len / text_len * 100, 1)
                     },
                     'message': 'Text summarized successfully'
                 }
@@ -180,15 +383,15 @@ class AIAnalysisService:
                     'message': 'Failed to generate summary - no results returned'
                 }
                 
-        except requests.exceptions.RequestException as e:
-            print(f"Summarization Network Error: {str(e)}")
+        except httpx.HTTPError as e:
+            logger.warning("Summarization network error: %s", e)
             return {
                 'success': False,
                 'result': None,
                 'message': f'Network error during summarization: {str(e)}'
             }
         except Exception as e:
-            print(f"Summarization Error: {str(e)}")
+            logger.exception("Summarization failed")
             return {
                 'success': False,
                 'result': None,
@@ -201,10 +404,8 @@ class AIAnalysisService:
         """Analyze sentiment using Hugging Face sentiment analysis model"""
         try:
             # Use the configured sentiment model
-            model_url = f"{self.api_url}/{self.models['sentiment']}"
+            model_url = self._sentiment_url
             
-            # Clean and prepare text
-            text = clean_text(text)
             if len(text) < 5:
                 return {
                     'success': False,
@@ -213,81 +414,91 @@ class AIAnalysisService:
                 }
             
             # Limit text length for better performance
-            if len(text) > 512:
-                text = text[:512]
+            text = self._sentiment_input(text)
             
             payload = {
                 "inputs": text
             }
             
-            print(f"Sentiment Analysis - Text length: {len(text)}")
-            
-            response = requests.post(
-                model_url,
-                headers=self.headers,
-                json=payload,
-                timeout=30
-            )
+            logger.debug("Sentiment analysis - text length: %d", len(text))
             
-            response.raise_for_status()
-            result = response.json()
+            result = await self._post(model_url, payload)
             
-            print(f"Sentiment Analysis Response: {result}")
+            logger.debug("Sentiment Analysis response: %s", result)
             
-            if isinstance(result, list) and len(result) > 0:
-                # Find the highest scoring sentiment
-                best_result = max(result, key=lambda x: x.get('score', 0))
-                label = best_result.get('label', 'neutral')
-                score = best_result.get('score', 0.0)
-                
-                # Map labels to user-friendly names
-                label_mapping = {
-                    'LABEL_0': 'Negative',
-                    'LABEL_1': 'Neutral', 
-                    'LABEL_2': 'Positive'
-                }
-                
-                sentiment_label = label_mapping.get(label, 'Neutral')
-                
-                emoji_map = {
-                    "Positive": "😊",
-                    "Neutral": "😐",
-                    "Negative": "😞"
-                }
-                
-                # Ensure confidence is capped at 100%
-                confidence_score = min(round(score * 100, 1), 100.0)
-                
-                return {
-                    'success': True,
-                    'result': {
-                        'sentiment': sentiment_label,
-                        'confidence': confidence_score,
-                        'emoji': emoji_map.get(sentiment_label, "😐"),
-                        'text_analyzed': text[:100] + '...' if len(text) > 100 else text
-                    },
-                    'message': 'Sentiment analyzed successfully'
-                }
-            else:
-                return {
-                    'success': False,
-                    'result': None,
-                    'message': 'Failed to analyze sentiment - no results returned'
-                }
-        except requests.exceptions.RequestException as e:
-            print(f"Sentiment Analysis Network Error: {str(e)}")
+            return self._format_sentiment(text, result)
+        except httpx.HTTPError as e:
+            logger.warning("Sentiment Analysis network error: %s", e)
             return {
                 'success': False,
                 'result': None,
                 'message': f'Network error during sentiment analysis: {str(e)}'
             }
         except Exception as e:
-            print(f"Sentiment Analysis Error: {str(e)}")
+            logger.exception("Sentiment Analysis failed")
             return {
                 'success': False,
                 'result': None,
                 'message': f'Sentiment analysis failed: {str(e)}'
             }
+    
+    async def _analyze_sentiment_chunk(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Analyze a chunk of cleaned texts in a single inference call"""
+        try:
+            logger.debug("Sentiment batch - %d texts", len(texts))
+            
+            result = await self._post(self._sentiment_url, {"inputs": texts})
+            
+            logger.debug("Sentiment batch response: %s", result)
+            
+            if not isinstance(result, list) or len(result) != len(texts):
+                message = 'Failed to analyze sentiment - unexpected batch response'
+                return [{'success': False, 'result': None, 'message': message} for _ in texts]
+            
+            return [self._format_sentiment(text, scores) for text, scores in zip(texts, result)]
+        except httpx.HTTPError as e:
+            logger.warning("Sentiment batch network error: %s", e)
+            message = f'Network error during sentiment analysis: {str(e)}'
+        except Exception as e:
+            logger.exception("Sentiment batch failed")
+            message = f'Sentiment analysis failed: {str(e)}'
+        return [{'success': False, 'result': None, 'message': message} for _ in texts]
+    
+    def _format_sentiment(self, text: str, result: Any) -> Dict[str, Any]:
+        """Build the sentiment response from one input's label scores"""
+        # A single input may come back wrapped in an outer list
+        if isinstance(result, list) and result and isinstance(result[0], list):
+            result = result[0]
+        elif isinstance(result, dict):
+            result = [result]
+        
+        if isinstance(result, list) and len(result) > 0:
+            # Find the highest scoring sentiment; every label entry carries a score
+            best_result = max(result, key=itemgetter('score'))
+            label = best_result.get('label', 'neutral')
+            score = best_result.get('score', 0.0)
+            
+            sentiment_label, emoji = self._LABEL_TO_RESULT.get(label, self._NEUTRAL_RESULT)
+            
+            # Ensure confidence is capped at 100%
+            confidence_score = min(round(score * 100, 1), 100.0)
+            
+            return {
+                'success': True,
+                'result': {
+                    'sentiment': sentiment_label,
+                    'confidence': confidence_score,
+                    'emoji': emoji,
+                    'text_analyzed': _preview(text, 100)
+                },
+                'message': 'Sentiment analyzed successfully'
+            }
+        else:
+            return {
+                'success': False,
+                'result': None,
+                'message': 'Failed to analyze sentiment - no results returned'
+            }
 
 
 
@@ -295,10 +506,8 @@ class AIAnalysisService:
     async def _answer_question(self, context: str, question: str) -> Dict[str, Any]:
         """Answer questions using the roberta model with improved prompting"""
         try:
-            model_url = f"{self.api_url}/{self.models['question']}"
+            model_url = self._question_url
             
-            # Clean and prepare the context
-            context = clean_text(context)
             if len(context) < 10:
                 return {
                     'success': False,
@@ -307,8 +516,7 @@ class AIAnalysisService:
                 }
             
             # Check if context has meaningful content
-            meaningful_words = [word for word in context.split() if len(word) > 2]
-            if len(meaningful_words) < 5:
+            if not has_meaningful_words(context):
                 return {
                     'success': False,
                     'result': None,
@@ -326,20 +534,11 @@ class AIAnalysisService:
                 }
             }
             
-            print(f"Question: {question}")
-            print(f"Context length: {len(context)}")
-            
-            response = requests.post(
-                model_url,
-                headers=self.headers,
-                json=payload,
-                timeout=30
-            )
+            logger.debug("Question: %s (context length: %d)", question, len(context))
             
-            response.raise_for_status()
-            result = response.json()
+            result = await self._post(model_url, payload)
             
-            print(f"Question Answering Response: {result}")
+            logger.debug("Question Answering response: %s", result)
             
             if isinstance(result, dict):
                 answer = result.get('answer', '')
@@ -362,7 +561,7 @@ class AIAnalysisService:
                     'result': {
                         'answer': formatted_answer,
                         'confidence': confidence_percentage,
-                        'context_preview': context[:300] + '...' if len(context) > 300 else context,
+                        'context_preview': _preview(context, 300),
                         'question': question,
                         'answer_length': len(formatted_answer)
                     },
@@ -375,15 +574,15 @@ class AIAnalysisService:
                     'message': 'Invalid response format from question answering model'
                 }
                 
-        except requests.exceptions.RequestException as e:
-            print(f"Question Answering Network Error: {str(e)}")
+        except httpx.HTTPError as e:
+            logger.warning("Question Answering network error: %s", e)
             return {
                 'success': False,
                 'result': None,
                 'message': f'Network error during question answering: {str(e)}'
             }
         except Exception as e:
-            print(f"Question Answering Error: {str(e)}")
+            logger.exception("Question Answering failed")
             return {
                 'success': False,
                 'result': None,
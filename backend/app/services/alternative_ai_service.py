@@ -1,54 +1,121 @@
 
+import asyncio
+import copy
+import hashlib
+import logging
 import os
-import requests
-import json
+import re
+import httpx
+import orjson
 from typing import Dict, Any, Optional
-from dotenv import load_dotenv
+from cachetools import TTLCache
+from app.utils.env import load_env
+from app.utils.http_client import create_http_client
+from app.utils.text import has_meaningful_words
 
 # Load environment variables
-load_dotenv()
+load_env()
+
+logger = logging.getLogger(__name__)
+
+# Seconds a successful Cohere result is reused for the same type/prompt/text
+COHERE_RESULT_CACHE_TTL = int(os.getenv("COHERE_RESULT_CACHE_TTL", "3600"))
+
+# Attempts per Cohere call on rate limiting or unavailability, and the longest
+# single wait between them
+COHERE_MAX_ATTEMPTS = int(os.getenv("COHERE_MAX_ATTEMPTS", "3"))
+COHERE_MAX_RETRY_WAIT = float(os.getenv("COHERE_MAX_RETRY_WAIT", "10"))
+_RETRY_STATUSES = {429, 503}
+
+# Characters of context put into generate prompts; cost and latency grow with it.
+# Q&A keeps the head and tail, where answers are most likely to be.
+_QA_CTX_MAX = 8000
+_QA_CTX_HEAD = 2000
+_SENT_CTX_MAX = 4000
+_TRUNCATED = "...[truncated]"
+
+# The first sentiment word in a generation decides the label
+_SENTIMENT_RE = re.compile(r'\b(positive|negative|neutral)\b', re.IGNORECASE)
+# label -> (confidence, emoji)
+_SENTIMENT_RESULTS = {
+    "Positive": (85.0, "😊"),
+    "Neutral": (50.0, "😐"),
+    "Negative": (85.0, "😞")
+}
+
+# Whitespace-delimited words longer than two characters
+_WORD3_RE = re.compile(r'\S{3,}')
+
+_SENTIMENT_PROMPT = """Analyze the sentiment of the following text and provide:
+1. Overall sentiment (Positive/Negative/Neutral)
+2. Confidence level (0-100%)
+3. Key emotional indicators
+
+Text: {text}
+
+Analysis:"""
+
+_QA_PROMPT = """IMPORTANT: You must ONLY answer based on the information provided in the context below. Do NOT use any external knowledge or general information.
+
+Context: {context}
+
+Question: {question}
+
+Instructions:
+1. Answer ONLY using information from the provided context
+2. If the answer is not explicitly mentioned in the context, respond with: "Based on the provided text, I cannot find a specific answer to your question. The information may not be present in the extracted text."
+3. Do not make assumptions or provide general knowledge
+4. Quote specific parts of the context when possible
+5. If the context is unclear or insufficient, state that clearly
+
+Answer:"""
 
 def clean_text(text):
     """Clean OCR text by removing duplicate lines, excessive whitespace, and joining into a single paragraph."""
     if not text:
         return ""
     
-    # Split into lines and clean each line
-    lines = []
-    for line in text.splitlines():
-        line = line.strip()
-        if line and len(line) > 1:  # Only keep lines with meaningful content
-            lines.append(line)
-    
-    # Remove duplicates while preserving order
-    unique_lines = []
-    seen = set()
-    for line in lines:
-        if line not in seen:
-            unique_lines.append(line)
-            seen.add(line)
-    
-    # Join with proper spacing
-    cleaned_text = ' '.join(unique_lines)
+    # str.split() with no arguments strips and collapses all whitespace runs;
+    # dict.fromkeys removes duplicates while preserving order
+    lines = (' '.join(line.split()) for line in text.splitlines())
+    unique_lines = dict.fromkeys(line for line in lines if len(line) > 1)  # Only keep lines with meaningful content
     
-    # Remove excessive whitespace
-    import re
-    cleaned_text = re.sub(r'\s+', ' ', cleaned_text)
-    
-    return cleaned_text.strip()
+    return ' '.join(unique_lines)
 
 class AlternativeAIAnalysisService:
     """AI service using Cohere API for enhanced analysis"""
     
-    def __init__(self):
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
         # Cohere API
         self.cohere_api_key = os.getenv("COHERE_API_KEY")
         self.cohere_url = "https://api.cohere.ai/v1"
         
         if not self.cohere_api_key:
-            print("Warning: COHERE_API_KEY not set. Cohere features will not work.")
+            logger.warning("COHERE_API_KEY not set. Cohere features will not work.")
+        
+        self._headers = {
+            "Authorization": f"Bearer {self.cohere_api_key}",
+            "Content-Type": "application/json"
+        }
+        
+        # Pooled keep-alive client; an injected one is shared app-wide and
+        # closed by its owner, otherwise this service owns its own
+        self._owns_client = http_client is None
+        self._client = http_client or create_http_client()
+        
+        # sha256(type|prompt|cleaned text) -> successful result. Cohere output is
+        # bounded by max_tokens/length, so entries stay small.
+        self._cache = TTLCache(maxsize=500, ttl=COHERE_RESULT_CACHE_TTL)
+        self.cache_hits = 0
+        self.cache_misses = 0
+    
+    async def aclose(self):
+        """Close the pooled HTTP client if this service created it"""
+        if self._owns_client:
+            await self._client.aclose()
     
-    async def analyze_text(self, text: str, analysis_type: str, prompt: Optional[str] = None) -> Dict[str, Any]:
+    async def analyze_text(self, text: str, analysis_type: str, prompt: Optional[str] = None,
+                           already_clean: bool = False) -> Dict[str, Any]:
         """
         Analyze text using Cohere API
         
@@ -56,39 +123,82 @@ class AlternativeAIAnalysisService:
             text: Text to analyze
             analysis_type: Type of analysis ('summarize', 'sentiment', 'question')
             prompt: Optional prompt for question-answering or summarization
+            already_clean: Text has already been through clean_text; skip it
             
         Returns:
             dict: Analysis results
         """
         try:
             # Clean the text first
-            text = clean_text(text)
+            if not already_clean:
+                text = clean_text(text)
             
-            if analysis_type == 'summarize':
-                return await self._summarize_text(text, prompt)
-            elif analysis_type == 'sentiment':
-                return await self._analyze_sentiment(text)
-            elif analysis_type == 'question':
-                if not prompt:
-                    return {
-                        'success': False,
-                        'result': None,
-                        'message': 'Prompt is required for question analysis'
-                    }
-                return await self._answer_question(text, prompt)
-            else:
+            key = hashlib.sha256(f"{analysis_type}|{prompt or ''}|{text}".encode()).hexdigest()
+            cached = self._cache.get(key)
+            if cached is not None:
+                self.cache_hits += 1
+                # Callers may adjust the result dict, so never hand out the cached one
+                return copy.deepcopy(cached)
+            self.cache_misses += 1
+            
+            result = await self._dispatch(text, analysis_type, prompt)
+            if result.get('success'):
+                self._cache[key] = copy.deepcopy(result)
+            return result
+        except Exception as e:
+            return {
+                'success': False,
+                'result': None,
+                'message': f'Analysis failed: {str(e)}'
+            }
+    
+    async def _dispatch(self, text: str, analysis_type: str, prompt: Optional[str] = None) -> Dict[str, Any]:
+        """Route a request to the handler for its analysis type"""
+        if analysis_type == 'summarize':
+            return await self._summarize_text(text, prompt)
+        elif analysis_type == 'sentiment':
+            return await self._analyze_sentiment(text)
+        elif analysis_type == 'question':
+            if not prompt:
                 return {
                     'success': False,
                     'result': None,
-                    'message': f'Unknown analysis type: {analysis_type}'
+                    'message': 'Prompt is required for question analysis'
                 }
-        except Exception as e:
+            return await self._answer_question(text, prompt)
+        else:
             return {
                 'success': False,
                 'result': None,
-                'message': f'Analysis failed: {str(e)}'
+                'message': f'Unknown analysis type: {analysis_type}'
             }
     
+    async def _cohere_post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        POST a payload to a Cohere endpoint and return the decoded response
+        
+        429 and 503 are retried with exponential backoff, or after the server's
+        Retry-After when it sends one, capped at COHERE_MAX_RETRY_WAIT. The last
+        response's error is raised as usual.
+        """
+        url = f"{self.cohere_url}{path}"
+        content = orjson.dumps(payload)
+        for attempt in range(COHERE_MAX_ATTEMPTS):
+            response = await self._client.post(url, headers=self._headers, content=content)
+            if response.status_code not in _RETRY_STATUSES or attempt == COHERE_MAX_ATTEMPTS - 1:
+                break
+            
+            try:
+                wait = float(response.headers.get('retry-after', 2 ** attempt))
+            except ValueError:
+                wait = 2 ** attempt
+            wait = min(wait, COHERE_MAX_RETRY_WAIT)
+            logger.info("Cohere returned %d, retrying in %.1fs", response.status_code, wait)
+            await asyncio.sleep(wait)
+        
+        response.raise_for_status()
+        return orjson.loads(response.content)
+    
     async def _summarize_text(self, text: str, prompt: Optional[str] = None) -> Dict[str, Any]:
         """Summarize text using Cohere API"""
         try:
@@ -99,11 +209,6 @@ class AlternativeAIAnalysisService:
                     'message': 'Cohere API key not configured'
                 }
             
-            headers = {
-                "Authorization": f"Bearer {self.cohere_api_key}",
-                "Content-Type": "application/json"
-            }
-            
             # Prepare the text for Cohere (limit to 100KB as per Cohere docs)
             if len(text) > 100000:
                 text = text[:100000]
@@ -116,19 +221,11 @@ class AlternativeAIAnalysisService:
                 "additional_command": prompt or "Create a clear, well-structured summary of the extracted text only. Focus on key points and main ideas from the provided content. Do not add any external information or assumptions."
             }
             
-            print(f"Cohere Summarization - Text length: {len(text)}")
-            
-            response = requests.post(
-                f"{self.cohere_url}/summarize",
-                headers=headers,
-                json=payload,
-                timeout=30
-            )
+            logger.debug("Cohere summarization - text length: %d", len(text))
             
-            response.raise_for_status()
-            result = response.json()
+            result = await self._cohere_post("/summarize", payload)
             
-            print(f"Cohere Response: {result}")
+            logger.debug("Cohere summarization response: %s", result)
             
             summary = result.get('summary', '').strip()
             
@@ -150,15 +247,15 @@ class AlternativeAIAnalysisService:
                 },
                 'message': 'Text summarized successfully using Cohere'
             }
-        except requests.exceptions.RequestException as e:
-            print(f"Cohere Network Error: {str(e)}")
+        except httpx.HTTPError as e:
+            logger.warning("Cohere summarization network error: %s", e)
             return {
                 'success': False,
                 'result': None,
                 'message': f'Cohere network error: {str(e)}'
             }
         except Exception as e:
-            print(f"Cohere Error: {str(e)}")
+            logger.exception("Cohere summarization failed")
             return {
                 'success': False,
                 'result': None,
@@ -186,20 +283,12 @@ class AlternativeAIAnalysisService:
     async def _sentiment_with_cohere(self, text: str) -> Dict[str, Any]:
         """Analyze sentiment using Cohere Generate API"""
         try:
-            headers = {
-                "Authorization": f"Bearer {self.cohere_api_key}",
-                "Content-Type": "application/json"
-            }
+            truncated = len(text) > _SENT_CTX_MAX
+            if truncated:
+                text = text[:_SENT_CTX_MAX] + _TRUNCATED
             
             # Prepare the prompt for sentiment analysis
-            prompt = f"""Analyze the sentiment of the following text and provide:
-1. Overall sentiment (Positive/Negative/Neutral)
-2. Confidence level (0-100%)
-3. Key emotional indicators
-
-Text: {text}
-
-Analysis:"""
+            prompt = _SENTIMENT_PROMPT.format(text=text)
             
             payload = {
                 "model": "command",
@@ -211,51 +300,29 @@ Analysis:"""
                 "return_likelihoods": "NONE"
             }
             
-            print(f"Cohere Sentiment Analysis - Text length: {len(text)}")
+            logger.debug("Cohere sentiment analysis - text length: %d", len(text))
             
-            response = requests.post(
-                f"{self.cohere_url}/generate",
-                headers=headers,
-                json=payload,
-                timeout=30
-            )
+            result = await self._cohere_post("/generate", payload)
             
-            response.raise_for_status()
-            result = response.json()
-            
-            print(f"Cohere Sentiment Response: {result}")
+            logger.debug("Cohere sentiment response: %s", result)
             
             if 'generations' in result and len(result['generations']) > 0:
                 analysis = result['generations'][0]['text'].strip()
                 
                 # Extract sentiment from analysis
-                sentiment = "Neutral"
-                confidence = 50.0
-                
-                if "positive" in analysis.lower():
-                    sentiment = "Positive"
-                    confidence = 85.0
-                elif "negative" in analysis.lower():
-                    sentiment = "Negative"
-                    confidence = 85.0
-                
-                # Ensure confidence is capped at 100%
-                confidence = min(confidence, 100.0)
-                
-                emoji_map = {
-                    "Positive": "😊",
-                    "Neutral": "😐",
-                    "Negative": "😞"
-                }
+                match = _SENTIMENT_RE.search(analysis)
+                sentiment = match.group(1).title() if match else "Neutral"
+                confidence, emoji = _SENTIMENT_RESULTS[sentiment]
                 
                 return {
                     'success': True,
                     'result': {
                         'sentiment': sentiment,
                         'confidence': confidence,
-                        'emoji': emoji_map.get(sentiment, "😐"),
+                        'emoji': emoji,
                         'analysis': analysis,
-                        'api_used': 'Cohere Command'
+                        'api_used': 'Cohere Command',
+                        'truncated': truncated
                     },
                     'message': 'Sentiment analyzed successfully using Cohere'
                 }
@@ -265,15 +332,15 @@ Analysis:"""
                     'result': None,
                     'message': 'Invalid response format from Cohere'
                 }
-        except requests.exceptions.RequestException as e:
-            print(f"Cohere Sentiment Network Error: {str(e)}")
+        except httpx.HTTPError as e:
+            logger.warning("Cohere sentiment network error: %s", e)
             return {
                 'success': False,
                 'result': None,
                 'message': f'Cohere network error: {str(e)}'
             }
         except Exception as e:
-            print(f"Cohere Sentiment Error: {str(e)}")
+            logger.exception("Cohere sentiment analysis failed")
             return {
                 'success': False,
                 'result': None,
@@ -292,8 +359,7 @@ Analysis:"""
                 }
             
             # Check if context has meaningful content
-            meaningful_words = [word for word in context.split() if len(word) > 2]
-            if len(meaningful_words) < 5:
+            if not has_meaningful_words(context, pattern=_WORD3_RE):
                 return {
                     'success': False,
                     'result': None,
@@ -318,26 +384,13 @@ Analysis:"""
     async def _question_with_cohere(self, context: str, question: str) -> Dict[str, Any]:
         """Answer questions using Cohere Generate API"""
         try:
-            headers = {
-                "Authorization": f"Bearer {self.cohere_api_key}",
-                "Content-Type": "application/json"
-            }
+            truncated = len(context) > _QA_CTX_MAX
+            if truncated:
+                tail = _QA_CTX_MAX - _QA_CTX_HEAD
+                context = context[:_QA_CTX_HEAD] + _TRUNCATED + context[-tail:]
             
             # Prepare the prompt for Cohere with strict context-only instructions
-            prompt = f"""IMPORTANT: You must ONLY answer based on the information provided in the context below. Do NOT use any external knowledge or general information.
-
-Context: {context}
-
-Question: {question}
-
-Instructions:
-1. Answer ONLY using information from the provided context
-2. If the answer is not explicitly mentioned in the context, respond with: "Based on the provided text, I cannot find a specific answer to your question. The information may not be present in the extracted text."
-3. Do not make assumptions or provide general knowledge
-4. Quote specific parts of the context when possible
-5. If the context is unclear or insufficient, state that clearly
-
-Answer:"""
+            prompt = _QA_PROMPT.format(context=context, question=question)
             
             payload = {
                 "model": "command",
@@ -349,19 +402,11 @@ Answer:"""
                 "return_likelihoods": "NONE"
             }
             
-            print(f"Cohere Question Answering - Context length: {len(context)}")
-            
-            response = requests.post(
-                f"{self.cohere_url}/generate",
-                headers=headers,
-                json=payload,
-                timeout=30
-            )
+            logger.debug("Cohere question answering - context length: %d", len(context))
             
-            response.raise_for_status()
-            result = response.json()
+            result = await self._cohere_post("/generate", payload)
             
-            print(f"Cohere QA Response: {result}")
+            logger.debug("Cohere QA response: %s", result)
             
             if 'generations' in result and len(result['generations']) > 0:
                 answer = result['generations'][0]['text'].strip()
@@ -381,7 +426,8 @@ Answer:"""
                         'context_preview': context[:300] + '...' if len(context) > 300 else context,
                         'question': question,
                         'answer_length': len(answer),
-                        'api_used': 'Cohere Command'
+                        'api_used': 'Cohere Command',
+                        'truncated': truncated
                     },
                     'message': 'Question answered successfully using Cohere'
                 }
@@ -391,15 +437,15 @@ Answer:"""
                     'result': None,
                     'message': 'Invalid response format from Cohere'
                 }
-        except requests.exceptions.RequestException as e:
-            print(f"Cohere QA Network Error: {str(e)}")
+        except httpx.HTTPError as e:
+            logger.warning("Cohere QA network error: %s", e)
             return {
                 'success': False,
                 'result': None,
                 'message': f'Cohere network error: {str(e)}'
             }
         except Exception as e:
-            print(f"Cohere QA Error: {str(e)}")
+            logger.exception("Cohere question answering failed")
             return {
                 'success': False,
                 'result': None,
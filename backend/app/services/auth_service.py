@@ -1,18 +1,32 @@
+import asyncio
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status
 from app.models.schemas import UserCreate, UserLogin, UserResponse, TokenData
 from app.services.firestore_service import FirestoreService
+from app.services import token_cache
+import base64
+import logging
 import os
-import secrets
 import smtplib
+import threading
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger(__name__)
+
+# Password hashing. bcrypt_sha256 pre-hashes so passwords past bcrypt's 72-byte
+# limit are not silently truncated; plain bcrypt hashes from before still verify
+# and are upgraded on the next successful login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "10"))
+pwd_context = CryptContext(
+    schemes=["bcrypt_sha256", "bcrypt"],
+    deprecated="auto",
+    bcrypt_sha256__rounds=BCRYPT_ROUNDS,
+    bcrypt__rounds=BCRYPT_ROUNDS
+)
 
 # JWT Configuration
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
@@ -25,20 +39,52 @@ SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
 SMTP_USERNAME = os.getenv("SMTP_USERNAME", "")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
 FROM_EMAIL = os.getenv("FROM_EMAIL", "noreply@insightlens.com")
+FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:5173")
+
+# Static skeleton of the reset email; only the name and link vary per send
+_RESET_EMAIL_TMPL = """
+            Hello {user_name},
+
+            You have requested to reset your password for your InsightLens account.
+
+            To reset your password, please click on the following link:
+            {reset_link}
+
+            This link will expire in 1 hour.
+
+            If you did not request this password reset, please ignore this email.
+
+            Best regards,
+            The InsightLens Team
+            """
+
+# Reset tokens are 32 random bytes sliced from one bulk os.urandom read, so a
+# burst of resets costs one syscall per _TOKEN_BATCH tokens
+_TOKEN_BYTES = 32
+_TOKEN_BATCH = 256
+_TOKEN_BUF = b""
+_TOKEN_POS = _TOKEN_BATCH
+_TOKEN_LOCK = threading.Lock()
 
 class AuthService:
     """Service for user authentication and authorization"""
     
-    def __init__(self):
-        self.firestore_service = FirestoreService()
+    def __init__(self, firestore_service: Optional[FirestoreService] = None):
+        self.firestore_service = firestore_service or FirestoreService()
     
-    def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+    # bcrypt is deliberately slow CPU work, so it runs in a worker thread
+    # instead of stalling the event loop
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
         """Verify a password against its hash"""
-        return pwd_context.verify(plain_password, hashed_password)
+        return await asyncio.to_thread(pwd_context.verify, plain_password, hashed_password)
     
-    def get_password_hash(self, password: str) -> str:
+    async def get_password_hash(self, password: str) -> str:
         """Hash a password"""
-        return pwd_context.hash(password)
+        return await asyncio.to_thread(pwd_context.hash, password)
+    
+    async def verify_and_update_password(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Verify a password and return a replacement hash if the stored one is outdated"""
+        return await asyncio.to_thread(pwd_context.verify_and_update, plain_password, hashed_password)
     
     def create_access_token(self, data: dict, expires_delta: Optional[timedelta] = None) -> str:
         """Create a JWT access token"""
@@ -56,20 +102,31 @@ class AuthService:
     
     def verify_token(self, token: str) -> Optional[TokenData]:
         """Verify and decode a JWT token"""
+        token_hash = token_cache.hash_token(token)
+        cached = token_cache.get_cached_claims(token_hash)
+        if cached is not None:
+            return cached
+        
         try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            # No audience is issued, so skip that check
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={"verify_aud": False})
             email: str = payload.get("sub")
             if email is None:
                 return None
-            token_data = TokenData(email=email)
+            token_data = TokenData(email=email, exp=payload.get("exp"))
+            token_cache.cache_claims(token_hash, token_data)
             return token_data
         except JWTError:
             return None
     
     async def register_user(self, user_data: UserCreate) -> UserResponse:
         """Register a new user"""
-        # Check if user already exists
-        existing_user = await self.firestore_service.get_user_by_email(user_data.email)
+        # Check if user already exists; the hash is computed meanwhile since
+        # the lookup almost always comes back empty
+        existing_user, hashed_password = await asyncio.gather(
+            self.firestore_service.get_user_by_email(user_data.email),
+            self.get_password_hash(user_data.password)
+        )
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -77,7 +134,6 @@ class AuthService:
             )
         
         # Create new user
-        hashed_password = self.get_password_hash(user_data.password)
         user_doc = {
             'email': user_data.email,
             'full_name': user_data.full_name,
@@ -88,6 +144,7 @@ class AuthService:
         }
         
         user_id = await self.firestore_service.create_user(user_doc)
+        token_cache.invalidate_email(user_data.email)
         
         return UserResponse(
             id=user_id,
@@ -103,56 +160,87 @@ class AuthService:
         if not user:
             return None
         
-        if not self.verify_password(user_data.password, user['hashed_password']):
+        verified, new_hash = await self.verify_and_update_password(user_data.password, user['hashed_password'])
+        if not verified:
             return None
         
         if not user.get('is_active', True):
             return None
         
-        # Update last login
-        await self.firestore_service.update_user_last_login(user['id'])
+        # Update last login, and for an old scheme or cost store the rehash
+        # made while verifying; the two writes are independent
+        writes = [self.firestore_service.update_user_last_login(user['id'])]
+        if new_hash:
+            writes.append(self.firestore_service.update_user_password(user['id'], new_hash))
+        await asyncio.gather(*writes)
         
-        return UserResponse(
+        current_user = UserResponse(
             id=user['id'],
             email=user['email'],
             full_name=user['full_name'],
             created_at=user['created_at'],
             is_active=user.get('is_active', True)
         )
+        # The client's next requests resolve the profile without Firestore
+        token_cache.cache_user_by_email(current_user)
+        return current_user
     
     async def get_current_user(self, token: str) -> Optional[UserResponse]:
         """Get current user from JWT token"""
+        # Cache hits skip both the signature check and the Firestore lookup
+        token_hash = token_cache.hash_token(token)
+        cached_user = token_cache.get_cached_user(token_hash)
+        if cached_user is not None:
+            return cached_user
+        
         token_data = self.verify_token(token)
         if token_data is None:
             return None
         
-        user = await self.firestore_service.get_user_by_email(token_data.email)
-        if user is None:
-            return None
-        
-        return UserResponse(
-            id=user['id'],
-            email=user['email'],
-            full_name=user['full_name'],
-            created_at=user['created_at'],
-            is_active=user.get('is_active', True)
-        )
+        current_user = token_cache.get_cached_user_by_email(token_data.email)
+        if current_user is None:
+            # Only the profile fields; the password hash is not needed here
+            user = await self.firestore_service.get_user_by_email(
+                token_data.email, fields=['email', 'full_name', 'created_at', 'is_active']
+            )
+            if user is None:
+                return None
+            
+            current_user = UserResponse(
+                id=user['id'],
+                email=user['email'],
+                full_name=user['full_name'],
+                created_at=user['created_at'],
+                is_active=user.get('is_active', True)
+            )
+            token_cache.cache_user_by_email(current_user)
+        token_cache.cache_user(token_hash, current_user, token_data.exp)
+        return current_user
+    
+    def remember_token(self, token: str, user: UserResponse):
+        """Seed the verification cache for a freshly issued token"""
+        token_cache.cache_user(token_cache.hash_token(token), user)
 
     def generate_reset_token(self) -> str:
         """Generate a secure reset token"""
-        return secrets.token_urlsafe(32)
+        global _TOKEN_BUF, _TOKEN_POS
+        with _TOKEN_LOCK:
+            if _TOKEN_POS >= _TOKEN_BATCH:
+                _TOKEN_BUF = os.urandom(_TOKEN_BYTES * _TOKEN_BATCH)
+                _TOKEN_POS = 0
+            start = _TOKEN_POS * _TOKEN_BYTES
+            token_bytes = _TOKEN_BUF[start:start + _TOKEN_BYTES]
+            _TOKEN_POS += 1
+        # Same format as secrets.token_urlsafe(32)
+        return base64.urlsafe_b64encode(token_bytes).rstrip(b'=').decode('ascii')
 
     def send_reset_email(self, email: str, reset_token: str, user_name: str) -> bool:
         """Send password reset email"""
         try:
-            print(f"Attempting to send reset email to: {email}")
-            print(f"SMTP Configuration - Server: {SMTP_SERVER}, Port: {SMTP_PORT}")
-            print(f"SMTP Username: {SMTP_USERNAME}")
-            print(f"SMTP Password configured: {'Yes' if SMTP_PASSWORD else 'No'}")
+            logger.debug("Sending reset email to %s via %s:%s", email, SMTP_SERVER, SMTP_PORT)
             
             if not SMTP_USERNAME or not SMTP_PASSWORD:
-                print("❌ SMTP credentials not configured. Skipping email send.")
-                print("Please configure SMTP_USERNAME and SMTP_PASSWORD in your .env file")
+                logger.warning("SMTP_USERNAME/SMTP_PASSWORD not configured. Skipping reset email.")
                 return False
 
             # Create message
@@ -162,80 +250,50 @@ class AuthService:
             msg['Subject'] = "Password Reset Request - InsightLens"
 
             # Create reset link (you'll need to configure your frontend URL)
-            frontend_url = os.getenv("FRONTEND_URL", "http://localhost:5173")
-            reset_link = f"{frontend_url}/reset-password?token={reset_token}&email={email}"
-            
-            print(f"Reset link generated: {reset_link}")
+            reset_link = f"{FRONTEND_URL}/reset-password?token={reset_token}&email={email}"
 
             # Email body
-            body = f"""
-            Hello {user_name},
-
-            You have requested to reset your password for your InsightLens account.
-
-            To reset your password, please click on the following link:
-            {reset_link}
-
-            This link will expire in 1 hour.
-
-            If you did not request this password reset, please ignore this email.
-
-            Best regards,
-            The InsightLens Team
-            """
+            body = _RESET_EMAIL_TMPL.format(user_name=user_name, reset_link=reset_link)
 
             msg.attach(MIMEText(body, 'plain'))
 
-            print("Connecting to SMTP server...")
             # Send email
             server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
             server.starttls()
-            print("SMTP connection established, attempting login...")
             server.login(SMTP_USERNAME, SMTP_PASSWORD)
-            print("SMTP login successful, sending email...")
             text = msg.as_string()
             server.sendmail(FROM_EMAIL, email, text)
             server.quit()
 
-            print(f"✅ Password reset email sent successfully to {email}")
+            logger.info("Password reset email sent to %s", email)
             return True
 
         except smtplib.SMTPAuthenticationError as e:
-            print(f"❌ SMTP Authentication failed: {str(e)}")
-            print("Please check your SMTP_USERNAME and SMTP_PASSWORD")
+            logger.error("SMTP authentication failed, check SMTP_USERNAME and SMTP_PASSWORD: %s", e)
             return False
         except smtplib.SMTPException as e:
-            print(f"❌ SMTP error occurred: {str(e)}")
+            logger.error("SMTP error while sending reset email: %s", e)
             return False
-        except Exception as e:
-            print(f"❌ Failed to send reset email: {str(e)}")
-            print(f"Error type: {type(e).__name__}")
+        except Exception:
+            logger.exception("Failed to send reset email")
             return False
 
     async def request_password_reset(self, email: str) -> bool:
         """Request password reset for a user"""
         try:
-            print(f"🔍 Processing password reset request for email: {email}")
-            
             # Check if user exists
             user = await self.firestore_service.get_user_by_email(email)
             if not user:
-                print(f"❌ User not found with email: {email}")
+                logger.debug("Password reset requested for unknown email")
                 return False  # Don't reveal if user exists or not
 
-            print(f"✅ User found: {user['full_name']} (ID: {user['id']})")
-
             # Generate reset token
             reset_token = self.generate_reset_token()
             reset_expires = datetime.utcnow() + timedelta(hours=1)
             # Ensure timezone-naive datetime for consistent storage
             reset_expires = reset_expires.replace(tzinfo=None)
-            
-            print(f"🔑 Generated reset token: {reset_token[:10]}...")
-            print(f"⏰ Token expires at: {reset_expires}")
 
             # Store reset token in Firestore
-            print("💾 Storing reset token in Firestore...")
             token_stored = await self.firestore_service.store_reset_token(
                 user['id'], 
                 reset_token, 
@@ -243,82 +301,68 @@ class AuthService:
             )
             
             if not token_stored:
-                print("❌ Failed to store reset token in Firestore")
+                logger.error("Failed to store reset token for user %s", user['id'])
                 return False
-                
-            print("✅ Reset token stored successfully")
 
             # Send reset email
-            print("📧 Attempting to send reset email...")
-            email_sent = self.send_reset_email(email, reset_token, user['full_name'])
+            # smtplib blocks for the whole SMTP exchange, so keep it off the event loop
+            email_sent = await asyncio.to_thread(self.send_reset_email, email, reset_token, user['full_name'])
             
-            if email_sent:
-                print("✅ Password reset process completed successfully")
-                return True
-            else:
-                print("❌ Failed to send reset email")
-                return False
+            return email_sent
 
-        except Exception as e:
-            print(f"❌ Failed to request password reset: {str(e)}")
-            print(f"Error type: {type(e).__name__}")
+        except Exception:
+            logger.exception("Failed to request password reset")
             return False
 
     async def validate_reset_token(self, email: str, reset_token: str) -> bool:
         """Validate a password reset token"""
         try:
-            user = await self.firestore_service.get_user_by_email(email)
-            if not user:
-                return False
-
-            stored_token = await self.firestore_service.get_reset_token(user['id'])
-            if not stored_token:
-                return False
-
-            # Check if token matches and is not expired
-            # Convert stored datetime to timezone-naive for comparison
-            stored_expires = stored_token['expires']
-            if hasattr(stored_expires, 'replace'):
-                # If it's a timezone-aware datetime, convert to UTC and make it naive
-                stored_expires = stored_expires.replace(tzinfo=None)
-            
-            if (stored_token['token'] == reset_token and 
-                stored_expires > datetime.utcnow()):
-                return True
+            _, stored_token = await self.firestore_service.get_user_and_reset_token(email)
+            return self._reset_token_matches(stored_token, reset_token)
 
+        except Exception:
+            logger.exception("Failed to validate reset token")
             return False
 
-        except Exception as e:
-            print(f"Failed to validate reset token: {str(e)}")
+    def _reset_token_matches(self, stored_token: Optional[dict], reset_token: str) -> bool:
+        """Check a stored reset token against the submitted one and its expiry"""
+        if not stored_token:
             return False
 
+        # Check if token matches and is not expired
+        # Convert stored datetime to timezone-naive for comparison
+        stored_expires = stored_token['expires']
+        if hasattr(stored_expires, 'replace'):
+            # If it's a timezone-aware datetime, convert to UTC and make it naive
+            stored_expires = stored_expires.replace(tzinfo=None)
+        
+        return (stored_token['token'] == reset_token and 
+                stored_expires > datetime.utcnow())
+
     async def reset_password(self, email: str, reset_token: str, new_password: str) -> bool:
         """Reset user password using reset token"""
         try:
-            # Validate token
-            if not await self.validate_reset_token(email, reset_token):
-                return False
-
-            # Get user
-            user = await self.firestore_service.get_user_by_email(email)
-            if not user:
+            # Get user and validate token from the same read
+            user, stored_token = await self.firestore_service.get_user_and_reset_token(email)
+            if not user or not self._reset_token_matches(stored_token, reset_token):
                 return False
 
             # Hash new password
-            hashed_password = self.get_password_hash(new_password)
+            hashed_password = await self.get_password_hash(new_password)
 
-            # Update password in Firestore
+            # Update password and clear the reset token in one Firestore write
             success = await self.firestore_service.update_user_password(
                 user['id'], 
-                hashed_password
+                hashed_password,
+                clear_reset_token=True
             )
 
             if success:
-                # Clear reset token
-                await self.firestore_service.clear_reset_token(user['id'])
+                # Tokens issued before the reset must not keep resolving from cache
+                token_cache.invalidate_email(email)
 
             return success
 
-        except Exception as e:
-            print(f"Failed to reset password: {str(e)}")
+        except Exception:
+            logger.exception("Failed to reset password")
             return False
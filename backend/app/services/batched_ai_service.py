@@ -0,0 +1,110 @@
+import asyncio
+import functools
+import os
+from typing import Dict, Any, Optional, List, Tuple
+from app.services.alternative_ai_service import AlternativeAIAnalysisService
+
+# How long the worker waits for more requests before dispatching a burst
+AI_BATCH_WINDOW_MS = int(os.getenv("AI_BATCH_WINDOW_MS", "50"))
+AI_BATCH_MAX_SIZE = int(os.getenv("AI_BATCH_MAX_SIZE", "8"))
+
+class BatchedAIService:
+    """Micro-batching front for AlternativeAIAnalysisService
+
+    A request that arrives while the queue is idle is dispatched at once;
+    only when others are already waiting does the worker collect for a short
+    window. Identical (text, analysis_type, prompt) requests in the same batch
+    share a single upstream call. Cohere has no batch endpoint for
+    generate/summarize, so the distinct requests in a batch are sent
+    concurrently, and an upstream call is cancelled once every caller waiting
+    on it has been cancelled.
+    """
+
+    def __init__(self, service: AlternativeAIAnalysisService,
+                 window_ms: int = AI_BATCH_WINDOW_MS, max_batch: int = AI_BATCH_MAX_SIZE):
+        self.service = service
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._in_flight = set()
+
+    @property
+    def cohere_api_key(self) -> Optional[str]:
+        return self.service.cohere_api_key
+
+    def start(self):
+        """Start the background worker (call from the app lifespan)"""
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the worker and cancel batches that are still running"""
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, *self._in_flight, return_exceptions=True)
+            self._worker = None
+
+    async def analyze_text(self, text: str, analysis_type: str, prompt: Optional[str] = None,
+                           already_clean: bool = False) -> Dict[str, Any]:
+        """Queue an analysis and wait for its batch to complete"""
+        if self._worker is None:
+            return await self.service.analyze_text(text=text, analysis_type=analysis_type, prompt=prompt,
+                                                   already_clean=already_clean)
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(((text, analysis_type, prompt, already_clean), future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self._queue.get()]
+            # Nothing else waiting: a lone request should not pay the window
+            deadline = loop.time() + self.window if not self._queue.empty() else 0
+            while len(items) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            self._dispatch(items)
+
+    def _dispatch(self, items: List[Tuple[tuple, asyncio.Future]]):
+        """Start one upstream task per distinct request without awaiting it"""
+        groups: Dict[tuple, List[asyncio.Future]] = {}
+        for key, future in items:
+            if not future.done():  # caller gave up while queued
+                groups.setdefault(key, []).append(future)
+
+        for (text, analysis_type, prompt, already_clean), futures in groups.items():
+            task = asyncio.create_task(self.service.analyze_text(
+                text=text, analysis_type=analysis_type, prompt=prompt, already_clean=already_clean
+            ))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+            task.add_done_callback(functools.partial(self._resolve, futures))
+            for future in futures:
+                future.add_done_callback(functools.partial(self._abandon, task, futures))
+
+    @staticmethod
+    def _resolve(futures: List[asyncio.Future], task: asyncio.Task):
+        for future in futures:
+            if future.done():  # caller gave up (e.g. lost a speculative race)
+                continue
+            if task.cancelled():
+                future.cancel()
+            elif task.exception() is not None:
+                future.set_exception(task.exception())
+            else:
+                future.set_result(task.result())
+
+    @staticmethod
+    def _abandon(task: asyncio.Task, futures: List[asyncio.Future], _future: asyncio.Future):
+        # Cancel the upstream call once nobody is waiting for it
+        if all(future.cancelled() for future in futures):
+            task.cancel()
@@ -1,8 +1,37 @@
+import asyncio
+import logging
+import os
 from datetime import datetime
-from typing import Dict, Any, List, Optional
-from firebase_admin import firestore
-from app.utils.firebase_config import get_firestore_client
-from app.models.schemas import AnalysisRecord, ExtractionDocument, AnalysisType, UserDocument
+from typing import Dict, Any, List, Optional, Tuple
+from firebase_admin import firestore, storage
+from google.api_core.exceptions import NotFound
+from app.utils.firebase_config import get_async_firestore_client
+from app.models.schemas import AnalysisType
+
+logger = logging.getLogger(__name__)
+
+# Queued analysis writes are committed together once this many are waiting or
+# the window has passed since the first one arrived
+FIRESTORE_BATCH_WINDOW_MS = int(os.getenv("FIRESTORE_BATCH_WINDOW_MS", "10"))
+FIRESTORE_BATCH_MAX_SIZE = int(os.getenv("FIRESTORE_BATCH_MAX_SIZE", "50"))
+
+# Longest the startup warm-up read may hold up the app before it is abandoned
+FIRESTORE_WARMUP_TIMEOUT = float(os.getenv("FIRESTORE_WARMUP_TIMEOUT", "5"))
+
+# Fields a list view needs; the text and analyses stay on the server, every
+# document carries its own preview
+EXTRACTION_LIST_FIELDS = ['created_at', 'updated_at', 'user_id', 'image_url', 'analyses_count',
+                          'text_preview', 'text_length']
+
+# With a bucket set, extracted texts of at least EXTRACTION_TEXT_OFFLOAD_MIN
+# characters are stored as Cloud Storage objects and the Firestore document
+# keeps only their path and a preview
+EXTRACTION_TEXT_BUCKET = os.getenv("EXTRACTION_TEXT_BUCKET")
+EXTRACTION_TEXT_OFFLOAD_MIN = int(os.getenv("EXTRACTION_TEXT_OFFLOAD_MIN", "20000"))
+TEXT_PREVIEW_LENGTH = 200
+
+# Firestore rejects write batches with more operations than this
+FIRESTORE_MAX_BATCH_WRITES = 500
 
 class FirestoreService:
     """Service for Firestore database operations"""
@@ -11,19 +40,25 @@ class FirestoreService:
         self.db = None
         self.extractions_collection = "extractions"
         self.users_collection = "users"
+        # Analyses live one per document under their extraction, so appending
+        # one never rewrites the ones before it
+        self.analyses_subcollection = "analyses"
         self.enabled = None  # Will be determined when first accessed
+        self._bucket = None
+        self._write_queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
     
     def _ensure_initialized(self):
         """Ensure Firestore client is initialized"""
         if self.enabled is None:
             try:
-                self.db = get_firestore_client()
+                self.db = get_async_firestore_client()
                 self.enabled = True
-                print("✅ Firestore service initialized successfully")
+                logger.info("Firestore service initialized successfully")
             except Exception as e:
-                print(f"⚠️  Firestore not available: {str(e)}")
-                print("The app will run in development mode without database features.")
-                print("To enable database features, please configure Firebase (see env.example)")
+                logger.warning("Firestore not available: %s", e)
+                logger.warning("The app will run in development mode without database features.")
+                logger.warning("To enable database features, please configure Firebase (see env.example)")
                 self.db = None
                 self.enabled = False
     
@@ -41,31 +76,122 @@ class FirestoreService:
         """
         self._ensure_initialized()
         if not self.enabled:
-            print("Firestore is disabled. Skipping document creation.")
+            logger.debug("Firestore is disabled. Skipping document creation.")
             return "demo-doc-id"
             
         try:
-            doc_data = {
-                'user_id': user_id,
-                'created_at': datetime.utcnow().replace(tzinfo=None),
-                'image_url': image_url,
-                'extracted_text': extracted_text,
-                'analyses': []
-            }
-            
-            doc_ref = self.db.collection(self.extractions_collection).add(doc_data)
-            document_id = doc_ref[1].id
-            print(f"Created Firestore document with ID: {document_id} for user: {user_id}")
+            doc_data = self._build_extraction_document(extracted_text, user_id, image_url)
+            doc_ref = self.db.collection(self.extractions_collection).document()
+            document_id = doc_ref.id
+            await self._offload_text(document_id, doc_data)
+            await doc_ref.set(doc_data)
+            logger.info("Created Firestore document with ID: %s for user: %s", document_id, user_id)
             return document_id
             
         except Exception as e:
-            print(f"Failed to create extraction document: {str(e)}")
+            logger.error("Failed to create extraction document: %s", e)
             return "error-doc-id"
     
+    async def create_extraction_document_with_id(self, document_id: str, extracted_text: str,
+                                                 user_id: str, image_url: Optional[str] = None) -> bool:
+        """
+        Create an extraction document under a caller-chosen ID
+        
+        Merges into the document, so analyses committed before this write
+        (e.g. while it ran as a background task) keep their counter.
+        
+        Args:
+            document_id: The ID to store the document under
+            extracted_text: The text extracted from the image
+            user_id: The ID of the user who created the document
+            image_url: Optional URL of the uploaded image
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        self._ensure_initialized()
+        if not self.enabled:
+            logger.debug("Firestore is disabled. Skipping document creation.")
+            return False
+            
+        try:
+            doc_data = self._build_extraction_document(extracted_text, user_id, image_url)
+            await self._offload_text(document_id, doc_data)
+            await self.db.collection(self.extractions_collection).document(document_id).set(doc_data, merge=True)
+            logger.info("Created Firestore document with ID: %s for user: %s", document_id, user_id)
+            return True
+            
+        except Exception as e:
+            logger.error("Failed to create extraction document %s: %s", document_id, e)
+            return False
+    
+    @staticmethod
+    def _build_extraction_document(extracted_text: str, user_id: str,
+                                   image_url: Optional[str] = None) -> Dict[str, Any]:
+        # Filled in by Firestore on commit so ordering follows one clock
+        return {
+            'user_id': user_id,
+            'created_at': firestore.SERVER_TIMESTAMP,
+            'updated_at': firestore.SERVER_TIMESTAMP,
+            'image_url': image_url,
+            'extracted_text': extracted_text,
+            'text_preview': extracted_text[:TEXT_PREVIEW_LENGTH],
+            'text_length': len(extracted_text),
+            # A no-op bump rather than 0, so a merge never resets earlier analyses
+            'analyses_count': firestore.Increment(0)
+        }
+    
+    def _text_bucket(self):
+        """The Cloud Storage bucket for offloaded texts, or None when not configured"""
+        if self._bucket is None and EXTRACTION_TEXT_BUCKET:
+            self._bucket = storage.bucket(EXTRACTION_TEXT_BUCKET)
+        return self._bucket
+    
+    @staticmethod
+    def _text_path(document_id: str) -> str:
+        return f"extractions/{document_id}.txt"
+    
+    async def _offload_text(self, document_id: str, doc_data: Dict[str, Any]):
+        """Move a large extracted text out of doc_data into Cloud Storage
+        
+        On upload failure the text simply stays inline.
+        """
+        text = doc_data['extracted_text']
+        bucket = self._text_bucket()
+        if bucket is None or len(text) < EXTRACTION_TEXT_OFFLOAD_MIN:
+            return
+        
+        path = self._text_path(document_id)
+        try:
+            blob = bucket.blob(path)
+            await asyncio.to_thread(blob.upload_from_string, text, content_type='text/plain; charset=utf-8')
+        except Exception as e:
+            logger.warning("Failed to offload text of %s, storing it inline: %s", document_id, e)
+            return
+        
+        del doc_data['extracted_text']
+        doc_data['text_path'] = path
+    
+    async def fetch_text(self, document: Dict[str, Any]) -> str:
+        """Return a document's extracted text, downloading it if it was offloaded"""
+        if 'extracted_text' in document or 'text_path' not in document:
+            return document.get('extracted_text', '')
+        
+        bucket = self._text_bucket()
+        if bucket is None:
+            logger.error("Text of %s is in Cloud Storage but EXTRACTION_TEXT_BUCKET is not set",
+                         document['text_path'])
+            return document.get('text_preview', '')
+        blob = bucket.blob(document['text_path'])
+        return await asyncio.to_thread(blob.download_as_text)
+    
     async def add_analysis_to_document(self, document_id: str, analysis_type: AnalysisType, 
                                      result: Dict[str, Any], prompt: Optional[str] = None) -> bool:
         """
-        Add an analysis result to an existing extraction document
+        Add an analysis result to an extraction document
+        
+        The document need not exist yet; its counter is merged in and the
+        rest arrives with create_extraction_document_with_id.
         
         Args:
             document_id: The ID of the extraction document
@@ -78,86 +204,259 @@ class FirestoreService:
         """
         self._ensure_initialized()
         if not self.enabled:
-            print("Firestore is disabled. Skipping analysis storage.")
+            logger.debug("Firestore is disabled. Skipping analysis storage.")
             return False
             
         try:
-            analysis_record = {
-                'type': analysis_type.value,
-                'result': result,
-                'timestamp': datetime.utcnow().replace(tzinfo=None),
-                'prompt': prompt
-            }
-            
+            analysis_record = self._build_analysis_record(analysis_type, result, prompt)
             doc_ref = self.db.collection(self.extractions_collection).document(document_id)
-            doc_ref.update({
-                'analyses': firestore.ArrayUnion([analysis_record])
-            })
+            legacy_counts = await self._legacy_counts([doc_ref])
+            batch = self.db.batch()
+            self._stage_analyses(batch, doc_ref, [analysis_record], legacy_counts.get(document_id))
+            await batch.commit()
             
             return True
             
         except Exception as e:
-            print(f"Failed to add analysis to document: {str(e)}")
+            logger.error("Failed to add analysis to document: %s", e)
             return False
     
-    async def get_extraction_document(self, document_id: str) -> Optional[Dict[str, Any]]:
+    async def enqueue_analysis(self, document_id: str, analysis_type: AnalysisType,
+                               result: Dict[str, Any], prompt: Optional[str] = None) -> bool:
+        """
+        Queue an analysis result for the background batch writer
+        
+        Falls back to a direct add_analysis_to_document when the writer is not
+        running (e.g. outside the app lifespan).
+        
+        Returns:
+            bool: True if the write was queued or stored, False otherwise
+        """
+        if self._writer is None:
+            return await self.add_analysis_to_document(document_id, analysis_type, result, prompt)
+        
+        self._ensure_initialized()
+        if not self.enabled:
+            logger.debug("Firestore is disabled. Skipping analysis storage.")
+            return False
+        
+        await self._write_queue.put((document_id, self._build_analysis_record(analysis_type, result, prompt)))
+        return True
+    
+    async def warm_up(self):
+        """Open the client and its gRPC channel with one tiny read (call from the app lifespan)"""
+        self._ensure_initialized()
+        if not self.enabled:
+            return
+        
+        try:
+            query = self.db.collection(self.extractions_collection).select([]).limit(1)
+            await asyncio.wait_for(query.get(), FIRESTORE_WARMUP_TIMEOUT)
+            logger.info("Firestore connection warmed up")
+        except Exception as e:
+            # Requests still work; the first one just pays the connection setup
+            logger.warning("Firestore warm-up failed: %s", e)
+    
+    def start_analysis_writer(self):
+        """Start the background analysis writer (call from the app lifespan)"""
+        if self._writer is None:
+            self._write_queue = asyncio.Queue()
+            self._writer = asyncio.create_task(self._run_analysis_writer())
+    
+    async def stop_analysis_writer(self):
+        """Flush queued analysis writes and stop the writer"""
+        if self._writer is not None:
+            await self._write_queue.put(None)
+            await self._writer
+            self._writer = None
+    
+    async def _run_analysis_writer(self):
+        loop = asyncio.get_running_loop()
+        window = FIRESTORE_BATCH_WINDOW_MS / 1000
+        stopping = False
+        while not stopping:
+            item = await self._write_queue.get()
+            if item is None:
+                break
+            items = [item]
+            deadline = loop.time() + window
+            while len(items) < FIRESTORE_BATCH_MAX_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._write_queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                items.append(item)
+            
+            await self._commit_analyses(items)
+    
+    async def _commit_analyses(self, items: List[Tuple[str, Dict[str, Any]]]):
+        """Commit queued analysis records in one batch, retrying one by one on failure"""
+        # Several analyses of the same extraction collapse into a single update
+        grouped: Dict[str, List[Dict[str, Any]]] = {}
+        for document_id, analysis_record in items:
+            grouped.setdefault(document_id, []).append(analysis_record)
+        
+        collection = self.db.collection(self.extractions_collection)
+        try:
+            legacy_counts = await self._legacy_counts([collection.document(document_id) for document_id in grouped])
+        except Exception as e:
+            logger.warning("Failed to read analysis counters, incrementing them as they are: %s", e)
+            legacy_counts = {}
+        
+        batch = self.db.batch()
+        for document_id, records in grouped.items():
+            self._stage_analyses(batch, collection.document(document_id), records,
+                                 legacy_counts.get(document_id))
+        
+        try:
+            await batch.commit()
+            return
+        except Exception as e:
+            # A single rejected write fails the whole batch, so isolate it
+            logger.warning("Batched analysis write failed, retrying individually: %s", e)
+        
+        for document_id, records in grouped.items():
+            try:
+                batch = self.db.batch()
+                self._stage_analyses(batch, collection.document(document_id), records,
+                                     legacy_counts.get(document_id))
+                await batch.commit()
+            except Exception as e:
+                logger.error("Failed to add analysis to document %s: %s", document_id, e)
+    
+    @staticmethod
+    def _build_analysis_record(analysis_type: AnalysisType, result: Dict[str, Any],
+                               prompt: Optional[str] = None) -> Dict[str, Any]:
+        return {
+            'type': analysis_type.value,
+            'result': result,
+            'timestamp': firestore.SERVER_TIMESTAMP,
+            'prompt': prompt
+        }
+    
+    async def _legacy_counts(self, doc_refs) -> Dict[str, int]:
+        """Inline analyses of the given parents that predate analyses_count, by document ID"""
+        counts = {}
+        async for snapshot in self.db.get_all(doc_refs, field_paths=['analyses_count', 'analyses']):
+            if snapshot.exists:
+                data = snapshot.to_dict()
+                if 'analyses_count' not in data:
+                    counts[snapshot.id] = len(data.get('analyses', []))
+        return counts
+    
+    def _stage_analyses(self, batch, doc_ref, analysis_records: List[Dict[str, Any]],
+                        legacy_count: Optional[int] = None):
+        """Add analysis records and the parent's counter bump to a write batch
+        
+        The counter is merged rather than updated: the extraction is written
+        after /extract-text responds, so an analysis may commit first. A parent
+        from before the counter gets it seeded with legacy_count, the length
+        of its inline analyses array, instead of starting from 0.
+        """
+        analyses = doc_ref.collection(self.analyses_subcollection)
+        for record in analysis_records:
+            batch.set(analyses.document(), record)
+        if legacy_count is None:
+            count = firestore.Increment(len(analysis_records))
+        else:
+            count = legacy_count + len(analysis_records)
+        batch.set(doc_ref, {
+            'analyses_count': count,
+            'updated_at': firestore.SERVER_TIMESTAMP
+        }, merge=True)
+    
+    async def _get_analyses(self, doc_ref) -> List[Dict[str, Any]]:
+        """Read an extraction's analyses subcollection, oldest first"""
+        docs = (doc_ref.collection(self.analyses_subcollection)
+               .order_by('timestamp')
+               .stream())
+        return [doc.to_dict() async for doc in docs]
+    
+    async def get_extraction_document(self, document_id: str, include_analyses: bool = True,
+                                      include_text: bool = True,
+                                      fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
         """
         Retrieve an extraction document by ID
         
         Args:
             document_id: The ID of the document to retrieve
+            include_analyses: Also read the analyses subcollection into 'analyses'
+            include_text: Download an offloaded extracted_text from Cloud Storage
+            fields: Optional projection of the parent document (e.g. for version checks)
             
         Returns:
             Optional[Dict]: The document data or None if not found
         """
         self._ensure_initialized()
         if not self.enabled:
-            print("Firestore is disabled. Cannot retrieve document.")
+            logger.debug("Firestore is disabled. Cannot retrieve document.")
             return None
             
         try:
             doc_ref = self.db.collection(self.extractions_collection).document(document_id)
-            doc = doc_ref.get()
-            
-            if doc.exists:
-                return doc.to_dict()
+            if include_analyses:
+                doc, analyses = await asyncio.gather(doc_ref.get(field_paths=fields),
+                                                     self._get_analyses(doc_ref))
             else:
+                doc = await doc_ref.get(field_paths=fields)
+            if not doc.exists:
                 return None
+            
+            document = doc.to_dict()
+            if include_analyses:
+                # Documents written before the subcollection keep an inline array
+                document['analyses'] = document.get('analyses', []) + analyses
+            if include_text and 'text_path' in document:
+                document['extracted_text'] = await self.fetch_text(document)
+            return document
                 
         except Exception as e:
-            print(f"Failed to retrieve document: {str(e)}")
+            logger.error("Failed to retrieve document: %s", e)
             return None
     
-    async def get_recent_extractions(self, limit: int = 10) -> List[Dict[str, Any]]:
+    async def get_recent_extractions(self, limit: int = 10,
+                                     fields: Optional[List[str]] = EXTRACTION_LIST_FIELDS) -> List[Dict[str, Any]]:
         """
         Get recent extraction documents
         
+        Only the list-view fields are fetched by default; use
+        get_extraction_document for the full text and analyses.
+        
         Args:
             limit: Maximum number of documents to retrieve
+            fields: Projection to fetch, or None for whole documents
             
         Returns:
             List[Dict]: List of recent extraction documents
         """
         self._ensure_initialized()
         if not self.enabled:
-            print("Firestore is disabled. Cannot retrieve recent extractions.")
+            logger.debug("Firestore is disabled. Cannot retrieve recent extractions.")
             return []
             
         try:
-            docs = (self.db.collection(self.extractions_collection)
-                   .order_by('created_at', direction=firestore.Query.DESCENDING)
+            query = self.db.collection(self.extractions_collection)
+            if fields:
+                query = query.select(fields)
+            docs = (query.order_by('created_at', direction=firestore.Query.DESCENDING)
                    .limit(limit)
                    .stream())
             
-            return [doc.to_dict() for doc in docs]
+            return [{**doc.to_dict(), 'id': doc.id} async for doc in docs]
             
         except Exception as e:
-            print(f"Failed to retrieve recent extractions: {str(e)}")
+            logger.error("Failed to retrieve recent extractions: %s", e)
             return []
     
     async def delete_extraction_document(self, document_id: str) -> bool:
         """
-        Delete an extraction document
+        Delete an extraction document together with its analyses subcollection
         
         Args:
             document_id: The ID of the document to delete
@@ -167,16 +466,36 @@ class FirestoreService:
         """
         self._ensure_initialized()
         if not self.enabled:
-            print("Firestore is disabled. Cannot delete document.")
+            logger.debug("Firestore is disabled. Cannot delete document.")
             return False
             
         try:
             doc_ref = self.db.collection(self.extractions_collection).document(document_id)
-            doc_ref.delete()
+            # Deleting only the parent would orphan its analyses. The async
+            # recursive_delete flushes a synchronous BulkWriter on the event
+            # loop, so list the analyses by name and delete them in batches,
+            # parent last so a partial failure leaves the document visible.
+            analyses = doc_ref.collection(self.analyses_subcollection).select([]).stream()
+            refs = [snapshot.reference async for snapshot in analyses]
+            refs.append(doc_ref)
+            for start in range(0, len(refs), FIRESTORE_MAX_BATCH_WRITES):
+                batch = self.db.batch()
+                for ref in refs[start:start + FIRESTORE_MAX_BATCH_WRITES]:
+                    batch.delete(ref)
+                await batch.commit()
+            
+            bucket = self._text_bucket()
+            if bucket is not None:
+                try:
+                    await asyncio.to_thread(bucket.blob(self._text_path(document_id)).delete)
+                except NotFound:
+                    pass  # Most documents never had their text offloaded
+                except Exception as e:
+                    logger.warning("Failed to delete offloaded text of %s: %s", document_id, e)
             return True
             
         except Exception as e:
-            print(f"Failed to delete document: {str(e)}")
+            logger.error("Failed to delete document: %s", e)
             return False
     
     # User Management Methods
@@ -192,40 +511,42 @@ class FirestoreService:
         """
         self._ensure_initialized()
         if not self.enabled:
-            print("Firestore is disabled. Skipping user creation.")
+            logger.debug("Firestore is disabled. Skipping user creation.")
             return "demo-user-id"
             
         try:
-            doc_ref = self.db.collection(self.users_collection).add(user_data)
-            print(f"Created user with ID: {doc_ref[1].id}")
+            doc_ref = await self.db.collection(self.users_collection).add(user_data)
+            logger.info("Created user with ID: %s", doc_ref[1].id)
             return doc_ref[1].id
             
         except Exception as e:
-            print(f"Failed to create user: {str(e)}")
+            logger.error("Failed to create user: %s", e)
             return "error-user-id"
     
-    async def get_user_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+    async def get_user_by_email(self, email: str,
+                                fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
         """
         Get user by email address
         
         Args:
             email: User's email address
+            fields: Optional projection; only these fields are fetched
             
         Returns:
             Optional[Dict]: User data or None if not found
         """
         self._ensure_initialized()
         if not self.enabled:
-            print("Firestore is disabled. Cannot get user by email.")
+            logger.debug("Firestore is disabled. Cannot get user by email.")
             return None
             
         try:
-            docs = (self.db.collection(self.users_collection)
-                   .where('email', '==', email)
-                   .limit(1)
-                   .stream())
+            query = self.db.collection(self.users_collection).where('email', '==', email)
+            if fields:
+                query = query.select(fields)
+            docs = query.limit(1).stream()
             
-            for doc in docs:
+            async for doc in docs:
                 user_data = doc.to_dict()
                 user_data['id'] = doc.id
                 return user_data
@@ -233,7 +554,7 @@ class FirestoreService:
             return None
             
         except Exception as e:
-            print(f"Failed to get user by email: {str(e)}")
+            logger.error("Failed to get user by email: %s", e)
             return None
     
     async def get_user_by_id(self, user_id: str) -> Optional[Dict[str, Any]]:
@@ -248,12 +569,12 @@ class FirestoreService:
         """
         self._ensure_initialized()
         if not self.enabled:
-            print("Firestore is disabled. Cannot get user by ID.")
+            logger.debug("Firestore is disabled. Cannot get user by ID.")
             return None
             
         try:
             doc_ref = self.db.collection(self.users_collection).document(user_id)
-            doc = doc_ref.get()
+            doc = await doc_ref.get()
             
             if doc.exists:
                 user_data = doc.to_dict()
@@ -263,7 +584,7 @@ class FirestoreService:
                 return None
                 
         except Exception as e:
-            print(f"Failed to get user by ID: {str(e)}")
+            logger.error("Failed to get user by ID: %s", e)
             return None
     
     async def update_user_last_login(self, user_id: str) -> bool:
@@ -278,63 +599,197 @@ class FirestoreService:
         """
         self._ensure_initialized()
         if not self.enabled:
-            print("Firestore is disabled. Cannot update user last login.")
+            logger.debug("Firestore is disabled. Cannot update user last login.")
             return False
             
         try:
             doc_ref = self.db.collection(self.users_collection).document(user_id)
-            doc_ref.update({
-                'last_login': datetime.utcnow().replace(tzinfo=None)
+            await doc_ref.update({
+                'last_login': firestore.SERVER_TIMESTAMP
             })
             return True
             
         except Exception as e:
-            print(f"Failed to update user last login: {str(e)}")
+            logger.error("Failed to update user last login: %s", e)
             return False
     
-    async def get_user_extractions(self, user_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+    async def get_user_extractions(self, user_id: str, limit: int = 20,
+                                   start_after: Optional[datetime] = None,
+                                   fields: Optional[List[str]] = None,
+                                   start_after_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """
-        Get extraction documents for a specific user
+        Get a page of extraction documents for a specific user, newest first
+        
+        Documents with the same created_at are ordered by ID, so a cursor of
+        (created_at, id) never skips or repeats one.
         
         Args:
             user_id: User's ID
             limit: Maximum number of documents to retrieve
+            start_after: Only return documents created before this time (page cursor)
+            fields: Optional projection; created_at is always included for paging
+            start_after_id: ID of the last document of the previous page
             
         Returns:
             List[Dict]: List of user's extraction documents
         """
         self._ensure_initialized()
         if not self.enabled:
-            print("Firestore is disabled. Cannot get user extractions.")
+            logger.debug("Firestore is disabled. Cannot get user extractions.")
             return []
             
         try:
-            print(f"🔍 Querying extractions for user_id: {user_id}")
-            # First get all documents for the user without ordering
-            docs = (self.db.collection(self.extractions_collection)
-                   .where('user_id', '==', user_id)
-                   .stream())
+            logger.debug("Querying extractions for user_id: %s", user_id)
+            # Ordering and paging run server-side on the (user_id, created_at) index
+            query = (self.db.collection(self.extractions_collection)
+                    .where('user_id', '==', user_id)
+                    .order_by('created_at', direction=firestore.Query.DESCENDING)
+                    .order_by('__name__', direction=firestore.Query.DESCENDING))
+            if fields:
+                query = query.select(list(dict.fromkeys([*fields, 'created_at'])))
+            if start_after is not None:
+                cursor = {'created_at': start_after}
+                if start_after_id:
+                    cursor['__name__'] = start_after_id
+                query = query.start_after(cursor)
+            docs = query.limit(limit).stream()
             
             extractions = []
-            for doc in docs:
+            log_each = logger.isEnabledFor(logging.DEBUG)
+            async for doc in docs:
                 doc_data = doc.to_dict()
                 doc_data['id'] = doc.id  # Add document ID to the data
                 extractions.append(doc_data)
-                print(f"📄 Found extraction: {doc.id} with user_id: {doc_data.get('user_id')}")
-            
-            # Sort in Python instead of Firestore to avoid index requirement
-            extractions.sort(key=lambda x: x.get('created_at', datetime.utcnow().replace(tzinfo=None)), reverse=True)
-            
-            # Apply limit after sorting
-            extractions = extractions[:limit]
+                if log_each:
+                    logger.debug("Found extraction: %s with user_id: %s", doc.id, doc_data.get('user_id'))
             
-            print(f"✅ Retrieved {len(extractions)} extractions for user {user_id}")
+            logger.debug("Retrieved %d extractions for user %s", len(extractions), user_id)
             return extractions
             
         except Exception as e:
-            print(f"❌ Failed to retrieve user extractions: {str(e)}")
+            logger.error("Failed to retrieve user extractions: %s", e)
             return []
 
+    async def count_user_extractions(self, user_id: str) -> int:
+        """
+        Count a user's extraction documents with a server-side aggregation
+        
+        Args:
+            user_id: User's ID
+            
+        Returns:
+            int: Number of extraction documents owned by the user
+        """
+        self._ensure_initialized()
+        if not self.enabled:
+            logger.debug("Firestore is disabled. Cannot count user extractions.")
+            return 0
+            
+        try:
+            query = (self.db.collection(self.extractions_collection)
+                    .where('user_id', '==', user_id)
+                    .count(alias='total'))
+            return int((await query.get())[0][0].value)
+            
+        except Exception as e:
+            logger.error("Failed to count user extractions: %s", e)
+            return 0
+    
+    async def count_user_extractions_since(self, user_id: str, since: datetime) -> int:
+        """
+        Count a user's extraction documents created after a point in time
+        
+        Args:
+            user_id: User's ID
+            since: Only documents with created_at after this time are counted
+            
+        Returns:
+            int: Number of matching extraction documents
+        """
+        self._ensure_initialized()
+        if not self.enabled:
+            logger.debug("Firestore is disabled. Cannot count recent extractions.")
+            return 0
+            
+        try:
+            query = (self.db.collection(self.extractions_collection)
+                    .where('user_id', '==', user_id)
+                    .where('created_at', '>', since)
+                    .count(alias='recent'))
+            return int((await query.get())[0][0].value)
+            
+        except Exception as e:
+            logger.error("Failed to count recent extractions: %s", e)
+            return 0
+    
+    async def sum_user_analyses(self, user_id: str) -> int:
+        """
+        Sum the analyses_count field across a user's extraction documents
+        
+        Args:
+            user_id: User's ID
+            
+        Returns:
+            int: Total number of analyses stored for the user
+        """
+        self._ensure_initialized()
+        if not self.enabled:
+            logger.debug("Firestore is disabled. Cannot sum user analyses.")
+            return 0
+            
+        try:
+            query = (self.db.collection(self.extractions_collection)
+                    .where('user_id', '==', user_id)
+                    .sum('analyses_count', alias='analyses'))
+            return int((await query.get())[0][0].value or 0)
+            
+        except Exception as e:
+            logger.error("Failed to sum user analyses: %s", e)
+            return 0
+    
+    async def backfill_analyses_counts(self) -> int:
+        """
+        Set analyses_count on extraction documents written before it existed
+        
+        sum_user_analyses only sees the counter, so without it the inline
+        analyses array of an old document is missing from the user's total.
+        The count covers that array plus any analyses in the subcollection.
+        Documents that already have the field are skipped, so running this
+        again is harmless.
+        
+        Returns:
+            int: Number of documents updated
+        """
+        self._ensure_initialized()
+        if not self.enabled:
+            logger.debug("Firestore is disabled. Skipping the analyses_count backfill.")
+            return 0
+        
+        docs = (self.db.collection(self.extractions_collection)
+               .select(['analyses_count', 'analyses'])
+               .stream())
+        updated = 0
+        batch, staged = self.db.batch(), 0
+        async for doc in docs:
+            data = doc.to_dict()
+            if 'analyses_count' in data:
+                continue
+            stored = (doc.reference.collection(self.analyses_subcollection)
+                     .count(alias='total'))
+            count = len(data.get('analyses', [])) + int((await stored.get())[0][0].value)
+            batch.update(doc.reference, {'analyses_count': count})
+            staged += 1
+            if staged == FIRESTORE_MAX_BATCH_WRITES:
+                await batch.commit()
+                updated += staged
+                batch, staged = self.db.batch(), 0
+        if staged:
+            await batch.commit()
+            updated += staged
+        
+        logger.info("Backfilled analyses_count on %d extraction documents", updated)
+        return updated
+
     # Password Reset Methods
     async def store_reset_token(self, user_id: str, reset_token: str, expires: datetime) -> bool:
         """
@@ -350,19 +805,19 @@ class FirestoreService:
         """
         self._ensure_initialized()
         if not self.enabled:
-            print("Firestore is disabled. Cannot store reset token.")
+            logger.debug("Firestore is disabled. Cannot store reset token.")
             return False
             
         try:
             doc_ref = self.db.collection(self.users_collection).document(user_id)
-            doc_ref.update({
+            await doc_ref.update({
                 'reset_token': reset_token,
                 'reset_token_expires': expires
             })
             return True
             
         except Exception as e:
-            print(f"Failed to store reset token: {str(e)}")
+            logger.error("Failed to store reset token: %s", e)
             return False
 
     async def get_reset_token(self, user_id: str) -> Optional[Dict[str, Any]]:
@@ -377,12 +832,12 @@ class FirestoreService:
         """
         self._ensure_initialized()
         if not self.enabled:
-            print("Firestore is disabled. Cannot get reset token.")
+            logger.debug("Firestore is disabled. Cannot get reset token.")
             return None
             
         try:
             doc_ref = self.db.collection(self.users_collection).document(user_id)
-            doc = doc_ref.get()
+            doc = await doc_ref.get()
             
             if doc.exists:
                 user_data = doc.to_dict()
@@ -394,9 +849,30 @@ class FirestoreService:
             return None
             
         except Exception as e:
-            print(f"Failed to get reset token: {str(e)}")
+            logger.error("Failed to get reset token: %s", e)
             return None
 
+    async def get_user_and_reset_token(self, email: str) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        Get a user and their password reset token with a single read
+        
+        Only the email and reset token fields are fetched, so the returned user
+        carries no password hash or profile data beyond its ID.
+        
+        Args:
+            email: User's email address
+            
+        Returns:
+            Tuple: (user data or None, reset token data or None)
+        """
+        user = await self.get_user_by_email(email, fields=['email', 'reset_token', 'reset_token_expires'])
+        if not user or 'reset_token' not in user or 'reset_token_expires' not in user:
+            return user, None
+        return user, {
+            'token': user['reset_token'],
+            'expires': user['reset_token_expires']
+        }
+
     async def clear_reset_token(self, user_id: str) -> bool:
         """
         Clear password reset token for a user
@@ -409,44 +885,48 @@ class FirestoreService:
         """
         self._ensure_initialized()
         if not self.enabled:
-            print("Firestore is disabled. Cannot clear reset token.")
+            logger.debug("Firestore is disabled. Cannot clear reset token.")
             return False
             
         try:
             doc_ref = self.db.collection(self.users_collection).document(user_id)
-            doc_ref.update({
+            await doc_ref.update({
                 'reset_token': firestore.DELETE_FIELD,
                 'reset_token_expires': firestore.DELETE_FIELD
             })
             return True
             
         except Exception as e:
-            print(f"Failed to clear reset token: {str(e)}")
+            logger.error("Failed to clear reset token: %s", e)
             return False
 
-    async def update_user_password(self, user_id: str, hashed_password: str) -> bool:
+    async def update_user_password(self, user_id: str, hashed_password: str,
+                                   clear_reset_token: bool = False) -> bool:
         """
         Update user's password
         
         Args:
             user_id: User's ID
             hashed_password: New hashed password
+            clear_reset_token: Also delete the reset token in the same write
             
         Returns:
             bool: True if successful, False otherwise
         """
         self._ensure_initialized()
         if not self.enabled:
-            print("Firestore is disabled. Cannot update password.")
+            logger.debug("Firestore is disabled. Cannot update password.")
             return False
             
         try:
             doc_ref = self.db.collection(self.users_collection).document(user_id)
-            doc_ref.update({
-                'hashed_password': hashed_password
-            })
+            update = {'hashed_password': hashed_password}
+            if clear_reset_token:
+                update['reset_token'] = firestore.DELETE_FIELD
+                update['reset_token_expires'] = firestore.DELETE_FIELD
+            await doc_ref.update(update)
             return True
             
         except Exception as e:
-            print(f"Failed to update password: {str(e)}")
+            logger.error("Failed to update password: %s", e)
             return False 
\ No newline at end of file
@@ -1,45 +1,102 @@
+import asyncio
+import hashlib
+import logging
 import os
-import requests
-from typing import Optional
-from dotenv import load_dotenv
+import httpx
+from typing import BinaryIO, Optional, Union
+from cachetools import TTLCache
+from app.utils.env import load_env
+from app.services.ai_analysis_service import clean_text
+from app.utils.http_client import create_http_client
 
 # Load environment variables
-load_dotenv()
+load_env()
+
+logger = logging.getLogger(__name__)
+
+# clean_text drops every line of one character or less, so shorter output
+# has nothing to keep
+MIN_OCR_TEXT_LENGTH = 2
+
+# Seconds a successful OCR result is reused for a byte-identical image
+OCR_RESULT_CACHE_TTL = int(os.getenv("OCR_RESULT_CACHE_TTL", "3600"))
+
+# Attempts per OCR call on rate limiting or server errors, and the longest
+# single wait between them
+OCR_MAX_ATTEMPTS = int(os.getenv("OCR_MAX_ATTEMPTS", "3"))
+OCR_MAX_RETRY_WAIT = float(os.getenv("OCR_MAX_RETRY_WAIT", "5"))
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
 
 class OCRService:
     """Service for text extraction using OCR.space API"""
     
-    def __init__(self):
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
         self.api_key = os.getenv("OCR_SPACE_API_KEY")
         self.api_url = "https://api.ocr.space/parse/image"
         
         # Allow running without API key for development/testing
         if not self.api_key:
-            print("Warning: OCR_SPACE_API_KEY not set. OCR features may not work.")
+            logger.warning("OCR_SPACE_API_KEY not set. OCR features may not work.")
             self.api_key = "demo_key"  # Fallback for development
+        
+        # Form fields shared by every request; only the file type varies
+        self._base_payload = {
+            'apikey': self.api_key,
+            'language': 'eng',  # English language
+            'isOverlayRequired': False,
+            'detectOrientation': True,
+            'scale': True,
+            'OCREngine': 2  # OCR Engine 2 for better accuracy
+        }
+        
+        # Pooled keep-alive client so concurrent uploads share connections;
+        # an injected one is shared app-wide and closed by its owner
+        self._owns_client = http_client is None
+        self._client = http_client or create_http_client()
+        
+        # sha256(image bytes) -> successful result; only the text is kept, not the image
+        self._cache = TTLCache(maxsize=256, ttl=OCR_RESULT_CACHE_TTL)
+        self.cache_hits = 0
+        self.cache_misses = 0
+    
+    async def aclose(self):
+        """Close the pooled HTTP client if this service created it"""
+        if self._owns_client:
+            await self._client.aclose()
     
-    async def extract_text_from_image(self, image_data: bytes, filename: str) -> dict:
+    async def extract_text_from_image(self, image_data: Union[bytes, BinaryIO], filename: str,
+                                      content_hash: Optional[str] = None) -> dict:
         """
         Extract text from image using OCR.space API
         
+        Re-uploads of the same image are answered from the result cache.
+        
         Args:
-            image_data: Raw image data as bytes
+            image_data: Raw image data as bytes, or a seekable file streamed to
+                the API in chunks
             filename: Name of the uploaded file
+            content_hash: sha256 hex digest of the image; required for a file
             
         Returns:
             dict: Response containing extracted text and status
         """
+        key = content_hash or hashlib.sha256(image_data).hexdigest()
+        cached = self._cache.get(key)
+        if cached is not None:
+            self.cache_hits += 1
+            return dict(cached)
+        self.cache_misses += 1
+        
+        result = await self._run_ocr(image_data, filename)
+        if result['success']:
+            self._cache[key] = dict(result)
+        return result
+    
+    async def _run_ocr(self, image_data: Union[bytes, BinaryIO], filename: str) -> dict:
+        """Send one image to OCR.space and clean the text it returns"""
         try:
             # Prepare the request payload
-            payload = {
-                'apikey': self.api_key,
-                'language': 'eng',  # English language
-                'isOverlayRequired': False,
-                'filetype': self._get_file_extension(filename),
-                'detectOrientation': True,
-                'scale': True,
-                'OCREngine': 2  # OCR Engine 2 for better accuracy
-            }
+            payload = {**self._base_payload, 'filetype': self._get_file_extension(filename)}
             
             # Prepare files for upload
             files = {
@@ -47,24 +104,19 @@ class OCRService:
             }
             
             # Make the API request
-            response = requests.post(
-                self.api_url,
-                data=payload,
-                files=files,
-                timeout=60  # Increased timeout to 60 seconds
-            )
+            response = await self._post_image(payload, files)
             
             # Check if request was successful
             response.raise_for_status()
             
             # Parse the response
             result = response.json()
-            print(f"OCR Response: {result}")
+            logger.debug("OCR Response: %s", result)
             
             # Check if OCR was successful
             if result.get('IsErroredOnProcessing', False):
                 error_message = result.get('ErrorMessage', 'Unknown OCR error')
-                print(f"OCR Error: {error_message}")
+                logger.warning("OCR Error: %s", error_message)
                 return {
                     'success': False,
                     'text': '',
@@ -86,7 +138,7 @@ class OCRService:
                 for parsed_result in parsed_results
             ]).strip()
             
-            if not extracted_text:
+            if len(extracted_text) < MIN_OCR_TEXT_LENGTH:
                 return {
                     'success': False,
                     'text': '',
@@ -94,8 +146,13 @@ class OCRService:
                 }
             
             # Clean the extracted text
-            from app.services.ai_analysis_service import clean_text
             cleaned_text = clean_text(extracted_text)
+            if not cleaned_text:
+                return {
+                    'success': False,
+                    'text': '',
+                    'message': 'No meaningful text could be extracted from the image'
+                }
             
             return {
                 'success': True,
@@ -103,13 +160,13 @@ class OCRService:
                 'message': 'Text extracted and cleaned successfully'
             }
             
-        except requests.exceptions.Timeout as e:
+        except httpx.TimeoutException as e:
             return {
                 'success': False,
                 'text': '',
                 'message': f'OCR service timeout: The request took too long to complete. Please try again.'
             }
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             return {
                 'success': False,
                 'text': '',
@@ -122,6 +179,34 @@ class OCRService:
                 'message': f'Unexpected error: {str(e)}'
             }
     
+    async def _post_image(self, payload: dict, files: dict) -> httpx.Response:
+        """
+        POST an upload to OCR.space, retrying rate limits and server errors
+        
+        Waits follow the server's Retry-After when present, otherwise back off
+        exponentially from 0.3s, capped at OCR_MAX_RETRY_WAIT. Timeouts are not
+        retried; the last response is returned as is.
+        """
+        for attempt in range(OCR_MAX_ATTEMPTS):
+            response = await self._client.post(
+                self.api_url,
+                data=payload,
+                files=files,
+                timeout=60  # Increased timeout to 60 seconds
+            )
+            if response.status_code not in _RETRY_STATUSES or attempt == OCR_MAX_ATTEMPTS - 1:
+                break
+            
+            try:
+                wait = float(response.headers.get('retry-after', 0.3 * 2 ** attempt))
+            except ValueError:
+                wait = 0.3 * 2 ** attempt
+            wait = min(wait, OCR_MAX_RETRY_WAIT)
+            logger.info("OCR service returned %d, retrying in %.1fs", response.status_code, wait)
+            await asyncio.sleep(wait)
+        
+        return response
+    
     def _get_file_extension(self, filename: str) -> str:
         """Extract file extension from filename"""
         return filename.split('.')[-1].lower() if '.' in filename else 'jpg' 
\ No newline at end of file
@@ -0,0 +1,82 @@
+import hashlib
+import os
+import threading
+import time
+from typing import Optional
+from cachetools import LRUCache, TTLCache
+from app.models.schemas import TokenData, UserResponse
+
+# Seconds a verified token stays cached; entries never outlive the token's own exp
+TOKEN_CACHE_TTL = int(os.getenv("TOKEN_CACHE_TTL", "30"))
+
+# Seconds a user profile fetched for any token is reused by email
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "60"))
+
+# sha256(token) -> (UserResponse, expires_at). This and _user_cache are only
+# touched from the event loop and never across an await, so they need no
+# lock.
+_token_cache = TTLCache(maxsize=10000, ttl=TOKEN_CACHE_TTL)
+
+# email -> UserResponse, shared by every token of the same user
+_user_cache = TTLCache(maxsize=2048, ttl=USER_CACHE_TTL)
+
+# sha256(token) -> verified TokenData. A signature check stays valid until the
+# token's own exp, so these outlive the user cache; taken from sync code, hence
+# the thread lock.
+_claims_cache = LRUCache(maxsize=4096)
+_claims_cache_lock = threading.Lock()
+
+def hash_token(token: str) -> str:
+    """Hash a raw JWT so the token itself is never kept in memory as a key"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def get_cached_user(token_hash: str) -> Optional[UserResponse]:
+    """Return the cached user for a token hash, or None on a miss"""
+    entry = _token_cache.get(token_hash)
+    if entry is None:
+        return None
+    user, expires_at = entry
+    if expires_at <= time.time():
+        _token_cache.pop(token_hash, None)
+        return None
+    return user
+
+def cache_user(token_hash: str, user: UserResponse, exp: Optional[float] = None):
+    """Cache a verified user, capping the lifetime at the token's exp claim"""
+    expires_at = time.time() + TOKEN_CACHE_TTL
+    if exp is not None:
+        expires_at = min(expires_at, exp)
+    if expires_at <= time.time():
+        return
+    _token_cache[token_hash] = (user, expires_at)
+
+def get_cached_claims(token_hash: str) -> Optional[TokenData]:
+    """Return previously verified claims for a token hash, or None if absent or expired"""
+    with _claims_cache_lock:
+        claims = _claims_cache.get(token_hash)
+        if claims is None:
+            return None
+        if claims.exp is not None and claims.exp <= time.time():
+            _claims_cache.pop(token_hash, None)
+            return None
+        return claims
+
+def cache_claims(token_hash: str, claims: TokenData):
+    """Remember the verified claims of a token until it expires"""
+    with _claims_cache_lock:
+        _claims_cache[token_hash] = claims
+
+def get_cached_user_by_email(email: str) -> Optional[UserResponse]:
+    """Return the cached profile for an email, or None on a miss"""
+    return _user_cache.get(email)
+
+def cache_user_by_email(user: UserResponse):
+    """Cache a user profile under its email"""
+    _user_cache[user.email] = user
+
+def invalidate_email(email: str):
+    """Drop every cached token and the profile of a user (e.g. after a password reset)"""
+    _user_cache.pop(email, None)
+    stale = [key for key, (user, _) in _token_cache.items() if user.email == email]
+    for key in stale:
+        _token_cache.pop(key, None)
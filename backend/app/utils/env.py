@@ -0,0 +1,12 @@
+from functools import lru_cache
+from dotenv import load_dotenv
+
+@lru_cache(maxsize=1)
+def load_env() -> bool:
+    """Load the backend .env into os.environ once per process
+
+    Every module that reads configuration calls this at import; only the
+    first call searches for and parses the file. Variables already set in
+    the environment win over the file, as with a plain load_dotenv().
+    """
+    return load_dotenv()
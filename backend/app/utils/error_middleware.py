@@ -0,0 +1,40 @@
+import logging
+from fastapi.responses import ORJSONResponse
+
+logger = logging.getLogger(__name__)
+
+class UnhandledErrorMiddleware:
+    """
+    Turn exceptions that escape a route into a single logged 500 response
+
+    Routes only raise HTTPException for expected 4xx/5xx outcomes; anything else
+    ends up here. This is a plain ASGI middleware registered inside
+    CORSMiddleware so error responses still carry CORS headers (Starlette's
+    exception_handler(Exception) runs outside all user middleware).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def send_wrapper(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            logger.exception("Unhandled error on %s %s", scope["method"], scope["path"])
+            if response_started:
+                # Too late to send a 500 (e.g. a background task failed)
+                raise
+            response = ORJSONResponse({"detail": "Internal server error"}, status_code=500)
+            await response(scope, receive, send)
@@ -1,25 +1,93 @@
 import os
-import json
-import firebase_admin
-from firebase_admin import credentials, firestore
-from dotenv import load_dotenv
+import threading
+from functools import lru_cache
+import orjson
+from app.utils.env import load_env
 
 # Load environment variables
-load_dotenv()
+load_env()
 
-# Global variable to store the Firestore client
-db = None
+# initialize_firebase() runs its body once per process, under this lock;
+# _firebase_ready records whether it produced a usable app
+_init_lock = threading.Lock()
+_initialized = False
+_firebase_ready = False
+
+# Parsed FIREBASE_CONFIG_JSON. The environment does not change within a
+# process, so this (like _load_firebase_env) lives as long as the process.
+_parsed_config_cache = None
+
+# Firestore clients, built on first use. Each owns a gRPC channel pool, so
+# exactly one of each is shared process-wide.
+_db_lock = threading.Lock()
+_db = None
+_async_db = None
+
+# Static fields of a service-account credential built from individual env vars
+_SERVICE_ACCOUNT_TEMPLATE = {
+    "type": "service_account",
+    "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+    "token_uri": "https://oauth2.googleapis.com/token",
+    "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
+}
+
+# Printed as one block when no Firebase configuration is set
+_MISSING_CONFIG_MESSAGE = "\n".join([
+    "⚠️  Firebase configuration not found!",
+    "To enable database features, please:",
+    "1. Create a .env file in the backend directory",
+    "2. Add your Firebase configuration (see env.example)",
+    "3. Or set individual environment variables:",
+    "   - FIREBASE_PROJECT_ID",
+    "   - FIREBASE_PRIVATE_KEY_ID",
+    "   - FIREBASE_PRIVATE_KEY",
+    "   - FIREBASE_CLIENT_EMAIL",
+    "   - FIREBASE_CLIENT_ID",
+    "   - FIREBASE_CLIENT_X509_CERT_URL",
+    "",
+    "Database features will be disabled. The app will run in development mode.",
+])
 
 def initialize_firebase():
-    """Initialize Firebase Admin SDK with service account credentials"""
-    global db
+    """Initialize Firebase Admin SDK with service account credentials
+
+    Safe to call from several threads and more than once; only the first
+    call parses the configuration.
+    """
+    global _initialized
+
+    with _init_lock:
+        if _initialized:
+            return
+        _initialized = True
+        _initialize_firebase()
+
+@lru_cache(maxsize=1)
+def _load_firebase_env():
+    """Read the individual Firebase variables once per process"""
+    return (
+        os.getenv("FIREBASE_PROJECT_ID"),
+        os.getenv("FIREBASE_PRIVATE_KEY_ID"),
+        os.getenv("FIREBASE_PRIVATE_KEY"),
+        os.getenv("FIREBASE_CLIENT_EMAIL"),
+        os.getenv("FIREBASE_CLIENT_ID"),
+        os.getenv("FIREBASE_CLIENT_X509_CERT_URL", ""),
+    )
+
+def _initialize_firebase():
+    global _firebase_ready, _parsed_config_cache
+    
+    # firebase_admin pulls in gRPC, protobuf and google-auth; importing it here
+    # keeps importing this module cheap for code that never touches Firebase
+    import firebase_admin
+    from firebase_admin import credentials
     
     try:
         # Check if Firebase is already initialized
         try:
             firebase_admin.get_app()
             print("Firebase already initialized")
-            db = firestore.client()
+            _firebase_ready = True
             return
         except ValueError:
             pass
@@ -30,48 +98,36 @@ def initialize_firebase():
         if firebase_config_json:
             # Use JSON configuration
             try:
-                firebase_config = json.loads(firebase_config_json)
+                if _parsed_config_cache is None:
+                    _parsed_config_cache = orjson.loads(firebase_config_json)
+                firebase_config = _parsed_config_cache
                 cred = credentials.Certificate(firebase_config)
-            except json.JSONDecodeError as e:
+            except orjson.JSONDecodeError as e:
                 print(f"Error parsing FIREBASE_CONFIG_JSON: {str(e)}")
                 print("Please check your Firebase configuration JSON format")
                 print("Database features will be disabled")
                 return
         else:
             # Use individual environment variables
-            project_id = os.getenv("FIREBASE_PROJECT_ID")
-            private_key_id = os.getenv("FIREBASE_PRIVATE_KEY_ID")
-            private_key = os.getenv("FIREBASE_PRIVATE_KEY")
-            client_email = os.getenv("FIREBASE_CLIENT_EMAIL")
-            client_id = os.getenv("FIREBASE_CLIENT_ID")
+            (project_id, private_key_id, private_key, client_email,
+             client_id, client_x509_cert_url) = _load_firebase_env()
             
             if not all([project_id, private_key_id, private_key, client_email, client_id]):
-                print("⚠️  Firebase configuration not found!")
-                print("To enable database features, please:")
-                print("1. Create a .env file in the backend directory")
-                print("2. Add your Firebase configuration (see env.example)")
-                print("3. Or set individual environment variables:")
-                print("   - FIREBASE_PROJECT_ID")
-                print("   - FIREBASE_PRIVATE_KEY_ID") 
-                print("   - FIREBASE_PRIVATE_KEY")
-                print("   - FIREBASE_CLIENT_EMAIL")
-                print("   - FIREBASE_CLIENT_ID")
-                print("   - FIREBASE_CLIENT_X509_CERT_URL")
-                print("")
-                print("Database features will be disabled. The app will run in development mode.")
+                print(_MISSING_CONFIG_MESSAGE)
                 return
             
+            # Keys pasted on one line carry literal \n escapes; real newlines need no copy
+            if '\\n' in private_key:
+                private_key = private_key.replace('\\n', '\n')
+            
             firebase_config = {
-                "type": "service_account",
+                **_SERVICE_ACCOUNT_TEMPLATE,
                 "project_id": project_id,
                 "private_key_id": private_key_id,
-                "private_key": private_key.replace('\\n', '\n'),
+                "private_key": private_key,
                 "client_email": client_email,
                 "client_id": client_id,
-                "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                "token_uri": "https://oauth2.googleapis.com/token",
-                "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
-                "client_x509_cert_url": os.getenv("FIREBASE_CLIENT_X509_CERT_URL", "")
+                "client_x509_cert_url": client_x509_cert_url
             }
             cred = credentials.Certificate(firebase_config)
         
@@ -80,18 +136,41 @@ def initialize_firebase():
             'projectId': firebase_config.get('project_id', 'your-project-id')
         })
         
-        # Get Firestore client
-        db = firestore.client()
-        
+        _firebase_ready = True
         print("✅ Firebase initialized successfully")
         
     except Exception as e:
         print(f"❌ Error initializing Firebase: {str(e)}")
         print("Database features will be disabled")
-        db = None
+        _firebase_ready = False
+
+def _require_firebase():
+    initialize_firebase()
+    if not _firebase_ready:
+        raise RuntimeError("Firebase not initialized. Check the Firebase configuration.")
 
 def get_firestore_client():
-    """Get the Firestore client instance"""
-    if db is None:
-        raise RuntimeError("Firebase not initialized. Call initialize_firebase() first.")
-    return db 
\ No newline at end of file
+    """Get the Firestore client instance (created on first use and reused)"""
+    global _db
+    
+    if _db is not None:
+        return _db
+    with _db_lock:
+        if _db is None:
+            _require_firebase()
+            from firebase_admin import firestore
+            _db = firestore.client()
+    return _db
+
+def get_async_firestore_client():
+    """Get the asyncio Firestore client instance (created on first use and reused)"""
+    global _async_db
+    
+    if _async_db is not None:
+        return _async_db
+    with _db_lock:
+        if _async_db is None:
+            _require_firebase()
+            from firebase_admin import firestore_async
+            _async_db = firestore_async.client()
+    return _async_db 
\ No newline at end of file
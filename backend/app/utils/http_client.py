@@ -0,0 +1,17 @@
+import httpx
+
+def create_http_client() -> httpx.AsyncClient:
+    """Build a pooled keep-alive client for outbound API calls
+
+    Failed connection attempts are retried by the transport, and connecting
+    gets a shorter budget than reading. The caller owns the client and must
+    aclose() it. No default headers are set, so one client can be shared by
+    services that authenticate differently.
+    """
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(30, connect=5),
+        transport=httpx.AsyncHTTPTransport(
+            retries=3,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+        )
+    )
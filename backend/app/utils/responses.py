@@ -0,0 +1,21 @@
+from datetime import datetime
+from typing import Any
+import orjson
+from fastapi.responses import ORJSONResponse
+
+def _orjson_default(obj: Any) -> Any:
+    # orjson handles plain datetimes natively but rejects subclasses such as
+    # Firestore's DatetimeWithNanoseconds
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError
+
+class AppJSONResponse(ORJSONResponse):
+    """ORJSONResponse that also accepts raw Firestore documents"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content,
+            default=_orjson_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        )
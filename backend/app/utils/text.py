@@ -0,0 +1,14 @@
+import re
+from itertools import islice
+from typing import Pattern
+
+# Runs of three or more letters (any script); digits and punctuation don't count
+MEANINGFUL_WORD = re.compile(r'[^\W\d_]{3,}')
+
+def has_meaningful_words(text: str, minimum: int = 5, pattern: Pattern[str] = MEANINGFUL_WORD) -> bool:
+    """Whether text holds at least `minimum` matches of `pattern`
+
+    Stops scanning at the minimum-th match instead of splitting the whole
+    text, so long OCR output costs no more than short.
+    """
+    return sum(1 for _ in islice(pattern.finditer(text), minimum)) >= minimum
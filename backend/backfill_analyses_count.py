@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""
+Analyses Counter Backfill
+Sets analyses_count on extraction documents stored before the counter existed,
+so dashboard totals include their inline analyses. Safe to run more than once.
+
+Run from the backend directory with the same Firebase configuration as the app:
+    python backfill_analyses_count.py
+"""
+
+import asyncio
+import sys
+
+from app.services.firestore_service import FirestoreService
+
+async def main() -> int:
+    service = FirestoreService()
+    updated = await service.backfill_analyses_counts()
+    if not service.enabled:
+        print("❌ Firestore is not configured; nothing was backfilled")
+        return 1
+
+    print(f"✅ Set analyses_count on {updated} extraction documents")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,31 @@
+import multiprocessing
+import os
+
+# Gunicorn settings for production: gunicorn -c gunicorn_conf.py app.main:app
+# UvicornWorker runs each process on uvloop + httptools (from uvicorn[standard]).
+# Caches (auth tokens, analysis results) are per worker process.
+
+# Upper bound for the computed default; WEB_CONCURRENCY is used as given
+GUNICORN_MAX_WORKERS = int(os.getenv("GUNICORN_MAX_WORKERS", "4"))
+
+def default_workers() -> int:
+    """(2 x CPUs) + 1, capped
+
+    cpu_count() reports the host's cores, which on shared hosts is far more
+    than the container's CPU quota, so prefer the CPUs this process may run
+    on and cap the result so workers never outgrow the instance's memory.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS/Windows
+        cpus = multiprocessing.cpu_count()
+    return min(cpus * 2 + 1, GUNICORN_MAX_WORKERS)
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY") or default_workers())
+worker_class = "uvicorn.workers.UvicornWorker"
+threads = 1
+keepalive = 5
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+accesslog = "-"
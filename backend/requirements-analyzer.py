@@ -4,12 +4,29 @@ Python Version Compatibility Analyzer
 Analyzes your requirements and determines the optimal Python version for deployment.
 """
 
+import os
+import re
 import subprocess
 import sys
 import json
-from typing import Dict, List, Tuple
+import tempfile
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Analysis results are reused while the requirements file and this script are unchanged
+CACHE_FILE = Path.home() / ".cache" / "insightlens" / "req_analysis.json"
 
 class PythonVersionAnalyzer:
+    # Stable releases to recommend, newest first, parsed once as (major, minor, patch, version)
+    _RECOMMENDED = tuple((int(a), int(b), int(c), v)
+                         for v in ("3.11.7", "3.11.5", "3.11.4", "3.10.12", "3.9.18")
+                         for a, b, c in [v.split('.')])
+    
+    # Report markers, built once instead of per line
+    _ICONS = MappingProxyType({"success": "✅", "warning": "⚠️", "info": "ℹ️"})
+    _STATUS = MappingProxyType({True: "✅", False: "❓"})  # keyed on "compatibility data found"
+    
     def __init__(self):
         self.requirements_file = "requirements-render.txt"
         self.compatibility_matrix = {
@@ -38,17 +55,24 @@ class PythonVersionAnalyzer:
                 "4.0.1": {"python": ">=3.6"}
             }
         }
+        # The matrix is constant, so flatten it once for single-probe lookups
+        self._flat = {(pkg, ver): compat for pkg, vers in self.compatibility_matrix.items()
+                      for ver, compat in vers.items()}
+        self._known_pkgs = frozenset(self.compatibility_matrix)
     
     def parse_requirements(self) -> List[Tuple[str, str]]:
         """Parse requirements file and extract package versions"""
         packages = []
         try:
             with open(self.requirements_file, 'r') as f:
-                for line in f:
-                    line = line.strip()
-                    if line and not line.startswith('#') and '==' in line:
-                        package, version = line.split('==')
-                        packages.append((package.strip(), version.strip()))
+                lines = f.read().splitlines()
+            for line in lines:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                package, sep, version = line.partition('==')
+                if sep:
+                    packages.append((package.strip(), version.strip()))
         except FileNotFoundError:
             print(f"❌ {self.requirements_file} not found!")
             return []
@@ -59,7 +83,7 @@ class PythonVersionAnalyzer:
         """Analyze compatibility and recommend Python version"""
         analysis = {
             "packages": [],
-            "python_versions": set(),
+            "python_versions": [],  # (major, minor) minimums
             "rust_required": False,
             "recommendations": [],
             "issues": []
@@ -72,21 +96,22 @@ class PythonVersionAnalyzer:
                 "compatibility": "unknown"
             }
             
-            if package in self.compatibility_matrix:
-                if version in self.compatibility_matrix[package]:
-                    compat = self.compatibility_matrix[package][version]
-                    package_info["compatibility"] = compat
-                    
-                    # Check if Rust compilation is required
-                    if compat.get("requires_rust", False):
-                        analysis["rust_required"] = True
-                        analysis["issues"].append(f"⚠️ {package} {version} requires Rust compilation")
-                    
-                    # Add Python version requirement
-                    if "python" in compat:
-                        analysis["python_versions"].add(compat["python"])
-                else:
-                    analysis["issues"].append(f"⚠️ Unknown version {version} for {package}")
+            compat = self._flat.get((package, version))
+            if compat is not None:
+                package_info["compatibility"] = compat
+                
+                # Check if Rust compilation is required
+                if compat.get("requires_rust", False):
+                    analysis["rust_required"] = True
+                    analysis["issues"].append(f"⚠️ {package} {version} requires Rust compilation")
+                
+                # Add Python version requirement
+                if "python" in compat:
+                    m = re.match(r">=(\d+)\.(\d+)", compat["python"])
+                    if m:
+                        analysis["python_versions"].append((int(m.group(1)), int(m.group(2))))
+            elif package in self._known_pkgs:
+                analysis["issues"].append(f"⚠️ Unknown version {version} for {package}")
             else:
                 analysis["issues"].append(f"⚠️ No compatibility data for {package}")
             
@@ -111,25 +136,18 @@ class PythonVersionAnalyzer:
         
         # Recommend Python version
         if analysis["python_versions"]:
-            # Find the highest minimum Python version
-            min_versions = []
-            for version_req in analysis["python_versions"]:
-                if version_req.startswith(">="):
-                    min_versions.append(version_req[2:])
+            # Find the highest minimum Python version; tuples compare 3.10 above 3.9
+            required = max(analysis["python_versions"])
             
-            if min_versions:
-                # Recommend a stable version
-                recommended_versions = ["3.11.7", "3.11.5", "3.11.4", "3.10.12", "3.9.18"]
-                
-                for version in recommended_versions:
-                    major, minor, patch = map(int, version.split('.'))
-                    if f"{major}.{minor}" >= max(min_versions):
-                        recommendations.append({
-                            "type": "success",
-                            "message": f"Recommended Python version: {version}",
-                            "solution": f"Use python-{version} in runtime.txt"
-                        })
-                        break
+            # Recommend a stable version
+            for major, minor, patch, version in self._RECOMMENDED:
+                if (major, minor) >= required:
+                    recommendations.append({
+                        "type": "success",
+                        "message": f"Recommended Python version: {version}",
+                        "solution": f"Use python-{version} in runtime.txt"
+                    })
+                    break
         
         # Add general recommendations
         recommendations.append({
@@ -140,80 +158,126 @@ class PythonVersionAnalyzer:
         
         analysis["recommendations"] = recommendations
     
-    def generate_report(self, analysis: Dict) -> str:
-        """Generate a formatted report"""
-        report = []
-        report.append("=" * 60)
-        report.append("🐍 PYTHON VERSION COMPATIBILITY ANALYSIS")
-        report.append("=" * 60)
-        report.append("")
+    def _iter_report_lines(self, analysis: Dict) -> Iterator[str]:
+        """Yield the report one line at a time, without newlines"""
+        yield "=" * 60
+        yield "🐍 PYTHON VERSION COMPATIBILITY ANALYSIS"
+        yield "=" * 60
+        yield ""
         
         # Package Analysis
-        report.append("📦 PACKAGE ANALYSIS:")
-        report.append("-" * 30)
+        yield "📦 PACKAGE ANALYSIS:"
+        yield "-" * 30
         for package in analysis["packages"]:
-            status = "✅" if package["compatibility"] != "unknown" else "❓"
-            report.append(f"{status} {package['name']} {package['version']}")
-        report.append("")
+            status = self._STATUS[package["compatibility"] != "unknown"]
+            yield f"{status} {package['name']} {package['version']}"
+        yield ""
         
         # Issues
         if analysis["issues"]:
-            report.append("⚠️ ISSUES FOUND:")
-            report.append("-" * 30)
+            yield "⚠️ ISSUES FOUND:"
+            yield "-" * 30
             for issue in analysis["issues"]:
-                report.append(f"  {issue}")
-            report.append("")
+                yield f"  {issue}"
+            yield ""
         
         # Recommendations
-        report.append("💡 RECOMMENDATIONS:")
-        report.append("-" * 30)
+        yield "💡 RECOMMENDATIONS:"
+        yield "-" * 30
         for rec in analysis["recommendations"]:
-            icon = {"success": "✅", "warning": "⚠️", "info": "ℹ️"}[rec["type"]]
-            report.append(f"{icon} {rec['message']}")
-            report.append(f"   Solution: {rec['solution']}")
-            report.append("")
+            icon = self._ICONS[rec["type"]]
+            yield f"{icon} {rec['message']}"
+            yield f"   Solution: {rec['solution']}"
+            yield ""
         
         # Deployment Configuration
-        report.append("🚀 DEPLOYMENT CONFIGURATION:")
-        report.append("-" * 30)
-        report.append("Build Command: pip install --only-binary=all -r requirements-render.txt")
-        report.append("Start Command: uvicorn app.main:app --host 0.0.0.0 --port $PORT")
-        report.append("Root Directory: backend")
-        report.append("")
-        
-        return "\n".join(report)
+        yield "🚀 DEPLOYMENT CONFIGURATION:"
+        yield "-" * 30
+        yield "Build Command: pip install --only-binary=all -r requirements-render.txt"
+        yield "Start Command: gunicorn -c gunicorn_conf.py app.main:app"
+        yield "Root Directory: backend"
+    
+    def generate_report(self, analysis: Dict) -> str:
+        """Generate a formatted report"""
+        return "".join(line + "\n" for line in self._iter_report_lines(analysis))
     
     def create_runtime_txt(self, python_version: str):
         """Create runtime.txt with recommended Python version"""
-        content = f"python-{python_version}\n"
-        with open("runtime.txt", "w") as f:
-            f.write(content)
-        print(f"✅ Created runtime.txt with Python {python_version}")
+        content = f"python-{python_version}\n".encode()
+        fd = os.open("runtime.txt", os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.write(fd, content)
+        finally:
+            os.close(fd)
+        return f"✅ Created runtime.txt with Python {python_version}\n"
+    
+    def _cache_key(self) -> Optional[List]:
+        """Identify the inputs by path, mtime and size of the requirements file and this script"""
+        try:
+            req = os.stat(self.requirements_file)
+            script = os.stat(__file__)
+        except OSError:
+            return None
+        return [os.path.abspath(self.requirements_file), req.st_mtime_ns, req.st_size,
+                script.st_mtime_ns, script.st_size]
+    
+    def _load_cached_analysis(self, key: List) -> Optional[Dict]:
+        """Return the cached analysis if it was computed from the same inputs"""
+        try:
+            with open(CACHE_FILE, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(cached, dict) or cached.get("key") != key:
+            return None
+        return cached.get("analysis")
+    
+    def _store_analysis(self, key: List, analysis: Dict):
+        """Write the cache atomically so an interrupted run never leaves a torn file"""
+        try:
+            CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=CACHE_FILE.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump({"key": key, "analysis": analysis}, f, ensure_ascii=False)
+                os.replace(tmp_path, CACHE_FILE)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError:
+            pass  # caching is best effort
     
     def run_analysis(self):
         """Run the complete analysis"""
         print("🔍 Analyzing Python version compatibility...")
         print("")
         
-        # Parse requirements
-        packages = self.parse_requirements()
-        if not packages:
-            print("❌ No packages found to analyze!")
-            return
-        
-        # Analyze compatibility
-        analysis = self.analyze_compatibility(packages)
-        
-        # Generate and display report
-        report = self.generate_report(analysis)
-        print(report)
+        key = self._cache_key()
+        analysis = self._load_cached_analysis(key) if key else None
+        if analysis is None:
+            # Parse requirements
+            packages = self.parse_requirements()
+            if not packages:
+                print("❌ No packages found to analyze!")
+                return
+            
+            # Analyze compatibility
+            analysis = self.analyze_compatibility(packages)
+            if key:
+                self._store_analysis(key, analysis)
         
         # Create runtime.txt if recommended
+        status = ""
         for rec in analysis["recommendations"]:
             if rec["type"] == "success" and "Recommended Python version:" in rec["message"]:
                 version = rec["message"].split(": ")[1]
-                self.create_runtime_txt(version)
+                status = "\n" + self.create_runtime_txt(version)
                 break
+        
+        # Stream the report straight to stdout, then the runtime.txt status
+        sys.stdout.writelines(line + "\n" for line in self._iter_report_lines(analysis))
+        sys.stdout.write(status)
+        sys.stdout.flush()
 
 def main():
     analyzer = PythonVersionAnalyzer()
@@ -0,0 +1,194 @@
+import copy
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from firebase_admin import firestore
+from google.api_core.exceptions import NotFound
+
+from app.services.firestore_service import FirestoreService
+
+
+class FakeSnapshot:
+    def __init__(self, reference, data, field_paths=None):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+        self._field_paths = field_paths
+
+    def to_dict(self):
+        if self._data is None:
+            return None
+        data = copy.deepcopy(self._data)
+        if self._field_paths is not None:
+            data = {key: value for key, value in data.items() if key in self._field_paths}
+        return data
+
+
+class FakeDocument:
+    def __init__(self, db, path):
+        self._db = db
+        self.path = path
+        self.id = path.rsplit('/', 1)[-1]
+
+    def collection(self, name):
+        return FakeCollection(self._db, f"{self.path}/{name}")
+
+    async def get(self, field_paths=None):
+        return FakeSnapshot(self, self._db.docs.get(self.path), field_paths)
+
+    async def set(self, data, merge=False):
+        self._db.apply(self._db.docs, 'set', self.path, data, merge)
+
+    async def update(self, data):
+        self._db.apply(self._db.docs, 'update', self.path, data)
+
+
+class FakeQuery:
+    def __init__(self, db, path, filters=(), fields=None, order=(), limit=None):
+        self._db = db
+        self._path = path
+        self._filters = tuple(filters)
+        self._fields = fields
+        self._order = tuple(order)
+        self._limit = limit
+
+    def _copy(self, **changes):
+        state = dict(filters=self._filters, fields=self._fields, order=self._order, limit=self._limit)
+        state.update(changes)
+        return FakeQuery(self._db, self._path, **state)
+
+    def where(self, field, op, value):
+        return self._copy(filters=self._filters + ((field, op, value),))
+
+    def select(self, fields):
+        return self._copy(fields=list(fields))
+
+    def order_by(self, field, direction=None):
+        return self._copy(order=self._order + ((field, direction == firestore.Query.DESCENDING),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def _matches(self, data):
+        for field, op, value in self._filters:
+            if field not in data:
+                return False
+            if op == '==' and data[field] != value:
+                return False
+            if op == '>' and not data[field] > value:
+                return False
+        return True
+
+    def _snapshots(self):
+        prefix = self._path + '/'
+        snapshots = [FakeSnapshot(FakeDocument(self._db, path), data, self._fields)
+                     for path, data in self._db.docs.items()
+                     if path.startswith(prefix) and '/' not in path[len(prefix):] and self._matches(data)]
+        for field, descending in reversed(self._order):
+            if field == '__name__':
+                snapshots.sort(key=lambda snapshot: snapshot.id, reverse=descending)
+            else:
+                snapshots.sort(key=lambda snapshot: snapshot._data.get(field), reverse=descending)
+        return snapshots[:self._limit] if self._limit is not None else snapshots
+
+    async def _stream(self):
+        for snapshot in self._snapshots():
+            yield snapshot
+
+    def stream(self):
+        return self._stream()
+
+    async def get(self):
+        return self._snapshots()
+
+    def sum(self, field, alias):
+        total = sum(snapshot._data[field] for snapshot in self._snapshots()
+                    if isinstance(snapshot._data.get(field), (int, float)))
+        return FakeAggregation(alias, total)
+
+    def count(self, alias):
+        return FakeAggregation(alias, len(self._snapshots()))
+
+
+class FakeAggregation:
+    def __init__(self, alias, value):
+        self._result = SimpleNamespace(alias=alias, value=value)
+
+    async def get(self):
+        return [[self._result]]
+
+
+class FakeCollection(FakeQuery):
+    def document(self, document_id=None):
+        return FakeDocument(self._db, f"{self._path}/{document_id or uuid.uuid4().hex}")
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self._db = db
+        self._writes = []
+
+    def set(self, reference, data, merge=False):
+        self._writes.append(('set', reference.path, data, merge))
+
+    def update(self, reference, data):
+        self._writes.append(('update', reference.path, data, False))
+
+    def delete(self, reference):
+        self._writes.append(('delete', reference.path, None, False))
+
+    async def commit(self):
+        # All or nothing, like a Firestore batch
+        docs = copy.deepcopy(self._db.docs)
+        for kind, path, data, merge in self._writes:
+            self._db.apply(docs, kind, path, data, merge)
+        self._db.docs = docs
+
+
+class FakeFirestore:
+    """In-memory stand-in for the async Firestore client, keyed by document path"""
+
+    def __init__(self):
+        self.docs = {}
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def batch(self):
+        return FakeBatch(self)
+
+    async def get_all(self, references, field_paths=None):
+        for reference in references:
+            yield FakeSnapshot(reference, self.docs.get(reference.path), field_paths)
+
+    @staticmethod
+    def apply(docs, kind, path, data, merge=False):
+        if kind == 'delete':
+            docs.pop(path, None)
+            return
+        if kind == 'update' and path not in docs:
+            raise NotFound(f"No document to update: {path}")
+        current = dict(docs.get(path, {})) if kind == 'update' or merge else {}
+        for key, value in data.items():
+            if value is firestore.SERVER_TIMESTAMP:
+                value = datetime.now(timezone.utc)
+            elif isinstance(value, firestore.Increment):
+                value = current.get(key, 0) + value.value
+            current[key] = value
+        docs[path] = current
+
+
+@pytest.fixture
+def fake_db():
+    return FakeFirestore()
+
+
+@pytest.fixture
+def firestore_service(fake_db):
+    service = FirestoreService()
+    service.db = fake_db
+    service.enabled = True
+    return service
@@ -0,0 +1,45 @@
+import asyncio
+
+from app.services.ai_analysis_service import AIAnalysisService
+
+SCORES = [{'label': 'LABEL_2', 'score': 0.9}, {'label': 'LABEL_0', 'score': 0.1}]
+
+
+def make_service(monkeypatch):
+    service = AIAnalysisService(http_client=object())
+    posts = []
+
+    async def fake_post(url, payload):
+        posts.append(payload)
+        inputs = payload['inputs']
+        return [SCORES for _ in inputs] if isinstance(inputs, list) else [SCORES]
+
+    monkeypatch.setattr(service, '_post', fake_post)
+    return service, posts
+
+
+def test_single_and_batch_sentiment_share_cache_entries(monkeypatch):
+    service, posts = make_service(monkeypatch)
+    text = "The new release is fast and the team is delighted with it. " * 20
+
+    async def run():
+        single = await service.analyze_text(text, 'sentiment')
+        [batched] = await service.analyze_sentiments_batch([text])
+        return single, batched
+
+    single, batched = asyncio.run(run())
+    assert single['success'] and batched == single
+    assert len(posts) == 1
+    assert len(posts[0]['inputs']) == AIAnalysisService.TEXT_LIMITS['sentiment']
+
+
+def test_batch_sentiment_result_serves_single_path(monkeypatch):
+    service, posts = make_service(monkeypatch)
+    text = "Support answered quickly and solved every problem we had. " * 20
+
+    async def run():
+        await service.analyze_sentiments_batch([text])
+        return await service.analyze_text(text, 'sentiment')
+
+    assert asyncio.run(run())['success']
+    assert len(posts) == 1
@@ -0,0 +1,71 @@
+import asyncio
+
+from app.models.schemas import AnalysisType
+
+
+def test_recent_extractions_include_preview_without_offload(firestore_service):
+    text = "Quarterly revenue grew by twelve percent. " * 10
+
+    async def run():
+        assert await firestore_service.create_extraction_document_with_id('doc-1', text, 'user-1')
+        return await firestore_service.get_recent_extractions()
+
+    [row] = asyncio.run(run())
+    assert 'extracted_text' not in row
+    assert row['text_preview'] == text[:200]
+    assert row['text_length'] == len(text)
+
+
+def test_analysis_committed_before_its_extraction_is_kept(firestore_service):
+    record = firestore_service._build_analysis_record(AnalysisType.SENTIMENT, {'sentiment': 'Positive'})
+
+    async def run():
+        # The create runs as a background task, so /analyze can win the race
+        await firestore_service._commit_analyses([('doc-1', record)])
+        assert await firestore_service.create_extraction_document_with_id('doc-1', 'Some text', 'user-1')
+        return await firestore_service.get_extraction_document('doc-1')
+
+    document = asyncio.run(run())
+    assert document['user_id'] == 'user-1'
+    assert document['extracted_text'] == 'Some text'
+    assert document['analyses_count'] == 1
+    assert [analysis['type'] for analysis in document['analyses']] == ['sentiment']
+
+
+def test_new_analyses_count_on_top_of_a_legacy_inline_array(firestore_service, fake_db):
+    fake_db.docs['extractions/legacy'] = {
+        'user_id': 'user-1',
+        'extracted_text': 'Some text',
+        'analyses': [{'type': 'summarize'}, {'type': 'sentiment'}]
+    }
+    record = firestore_service._build_analysis_record(AnalysisType.QUESTION, {'answer': 'Yes'}, 'Is it?')
+
+    async def run():
+        await firestore_service._commit_analyses([('legacy', record)])
+        assert await firestore_service.add_analysis_to_document('legacy', AnalysisType.SENTIMENT, {})
+        return await firestore_service.get_extraction_document('legacy')
+
+    document = asyncio.run(run())
+    assert document['analyses_count'] == 4
+    assert len(document['analyses']) == 4
+
+
+def test_backfill_counts_legacy_documents_in_user_totals(firestore_service, fake_db):
+    fake_db.docs['extractions/legacy'] = {
+        'user_id': 'user-1',
+        'analyses': [{'type': 'summarize'}, {'type': 'sentiment'}]
+    }
+    fake_db.docs['extractions/legacy/analyses/a1'] = {'type': 'question'}
+    fake_db.docs['extractions/current'] = {'user_id': 'user-1', 'analyses_count': 1}
+    fake_db.docs['extractions/current/analyses/a2'] = {'type': 'sentiment'}
+
+    async def run():
+        before = await firestore_service.sum_user_analyses('user-1')
+        assert await firestore_service.backfill_analyses_counts() == 1
+        assert await firestore_service.backfill_analyses_counts() == 0
+        return before, await firestore_service.sum_user_analyses('user-1')
+
+    before, after = asyncio.run(run())
+    assert before == 1
+    assert after == 4
+    assert fake_db.docs['extractions/legacy']['analyses_count'] == 3
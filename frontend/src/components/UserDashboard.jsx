@@ -80,7 +80,7 @@ const UserDashboard = ({ user, onLogout, token, onBackToApp }) => {
         if (extractionsRes.ok) {
           const contentType = extractionsRes.headers.get('content-type');
           if (contentType && contentType.includes('application/json')) {
-            extractionsData = await extractionsRes.json();
+            extractionsData = (await extractionsRes.json()).items || [];
             console.log('📄 Extractions data:', extractionsData);
             console.log('📄 Number of extractions:', extractionsData.length);
           } else {
@@ -167,9 +167,43 @@ const UserDashboard = ({ user, onLogout, token, onBackToApp }) => {
     }
   };
 
-  const handleViewExtraction = (extraction) => {
+  // List items carry no analyses, and long texts only as a preview; the
+  // detail endpoint returns the full document
+  const fetchExtractionDetail = async (documentId) => {
+    try {
+      const response = await fetch(`${import.meta.env.VITE_API_URL}/api/user/extractions/${documentId}`, {
+        headers: {
+          'Authorization': `Bearer ${token}`
+        }
+      });
+
+      if (response.ok) {
+        return await response.json();
+      }
+    } catch (error) {
+      console.error('Error loading extraction details:', error);
+    }
+    return null;
+  };
+
+  const handleViewExtraction = async (extraction) => {
     setSelectedExtraction(extraction);
     setShowModal(true);
+
+    const detail = await fetchExtractionDetail(extraction.id);
+    if (detail) {
+      setSelectedExtraction(current => (current && current.id === extraction.id ? { ...extraction, ...detail } : current));
+    }
+  };
+
+  const extractionText = (extraction) => extraction.extracted_text ?? extraction.text_preview ?? '';
+
+  const copyExtractionText = async (extraction) => {
+    let text = extraction.extracted_text;
+    if (text === undefined) {
+      text = (await fetchExtractionDetail(extraction.id))?.extracted_text ?? extractionText(extraction);
+    }
+    copyToClipboard(text);
   };
 
   const copyToClipboard = (text) => {
@@ -340,12 +374,12 @@ const UserDashboard = ({ user, onLogout, token, onBackToApp }) => {
                         </span>
                       </div>
                       <p className="text-sm text-gray-900 mb-2">
-                        {truncateText(extraction.extracted_text, 200)}
+                        {truncateText(extractionText(extraction), 200)}
                       </p>
                       <div className="flex items-center space-x-4 text-xs text-gray-500">
-                        <span>{extraction.analyses?.length || 0} analyses</span>
+                        <span>{extraction.analyses_count ?? extraction.analyses?.length ?? 0} analyses</span>
                         <span>•</span>
-                        <span>{extraction.extracted_text.length} characters</span>
+                        <span>{extraction.text_length ?? extractionText(extraction).length} characters</span>
                       </div>
                     </div>
                     <div className="flex items-center space-x-2 ml-4">
@@ -357,7 +391,7 @@ const UserDashboard = ({ user, onLogout, token, onBackToApp }) => {
                         <Eye className="h-4 w-4" />
                       </button>
                       <button
-                        onClick={() => copyToClipboard(extraction.extracted_text)}
+                        onClick={() => copyExtractionText(extraction)}
                         className="p-2 text-gray-400 hover:text-green-600 hover:bg-green-50 rounded-lg transition-colors"
                         title="Copy text"
                       >
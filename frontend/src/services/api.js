@@ -126,12 +126,15 @@ export const authAPI = {
 // User data API
 export const userDataAPI = {
   /**
-   * Get user's extraction documents
+   * Get a page of the user's extraction documents, newest first
    * @param {number} limit - Maximum number of documents to retrieve
-   * @returns {Promise<Array>} User's extraction documents
+   * @param {string|null} cursor - next_cursor from the previous page
+   * @returns {Promise<{items: Array, next_cursor: string|null}>} Page of extraction documents
    */
-  getExtractions: async (limit = 20) => {
-    const response = await api.get(`/api/user/extractions?limit=${limit}`)
+  getExtractions: async (limit = 20, cursor = null) => {
+    const params = { limit }
+    if (cursor) params.cursor = cursor
+    const response = await api.get('/api/user/extractions', { params })
     return response.data
   },
 
@@ -7,6 +7,27 @@ This script helps you configure Firebase for the InsightLens application.
 import os
 import json
 import sys
+from pathlib import Path
+
+# orjson parses faster; the script still runs where only the stdlib is installed
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
+def write_env_file(env_path, env_content):
+    """Write the .env lines in one call, readable only by the owner"""
+    lines = [f"{entry}\n".encode("utf-8") for entry in env_content]
+    fd = os.open(env_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        if hasattr(os, "fchmod"):
+            os.fchmod(fd, 0o600)  # the mode above only applies to new files
+        if hasattr(os, "writev"):
+            os.writev(fd, lines)
+        else:  # Windows
+            os.write(fd, b"".join(lines))
+    finally:
+        os.close(fd)
 
 def create_env_file():
     """Create .env file in the backend directory"""
@@ -16,8 +37,9 @@ def create_env_file():
     print()
     
     # Check if .env already exists
-    env_path = os.path.join("backend", ".env")
-    if os.path.exists(env_path):
+    env_path = Path("backend") / ".env"
+    env_path.parent.mkdir(parents=True, exist_ok=True)
+    if env_path.is_file():
         response = input("⚠️  .env file already exists. Overwrite? (y/N): ")
         if response.lower() != 'y':
             print("Setup cancelled.")
@@ -43,21 +65,30 @@ def create_env_file():
     if use_json:
         print("\nOption 1: JSON Configuration (Recommended)")
         print("- Copy the entire content of your Firebase service account JSON file")
-        print("- Paste it below (press Enter twice when done):")
+        print("- Paste it below (input ends when the JSON object closes, or on a blank line):")
         print()
         
-        json_lines = []
+        # Read raw lines and stop once the braces balance, so no Enter is needed
+        chunks = []
+        depth = 0
         while True:
-            line = input()
-            if line.strip() == "" and json_lines:
+            line = sys.stdin.readline()
+            if not line:  # EOF
+                break
+            if not line.strip():
+                if chunks:
+                    break
+                continue
+            chunks.append(line)
+            depth += line.count("{") - line.count("}")
+            if depth <= 0:
                 break
-            json_lines.append(line)
         
-        if json_lines:
+        json_content = "".join(chunks).strip()
+        if json_content:
             try:
-                json_content = "\n".join(json_lines)
                 # Validate JSON
-                json.loads(json_content)
+                json_loads(json_content)
                 env_content.append(f'FIREBASE_CONFIG_JSON={json_content}')
                 print("✅ JSON configuration added successfully!")
             except json.JSONDecodeError:
@@ -132,9 +163,7 @@ def create_env_file():
     
     # Write .env file
     try:
-        os.makedirs("backend", exist_ok=True)
-        with open(env_path, 'w') as f:
-            f.write('\n'.join(env_content))
+        write_env_file(env_path, env_content)
         
         print("\n" + "=" * 50)
         print("✅ Configuration Complete!")